@@ -0,0 +1,413 @@
+import json
+import logging
+import shutil
+from datetime import datetime, timezone
+from functools import cached_property
+from pathlib import Path
+
+import joblib
+import numpy as np
+from classification_method import compute_metrics
+from feature_selection import apply_selected_features
+from gensim.models import Word2Vec
+from nltk.tokenize import word_tokenize
+from prediction import DEFAULT_BATCH_SIZE, predict_batched, predict_with_scores
+from representation_method import apply_idf
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+ARTIFACT_FORMAT_VERSION = 2
+# Version 1 lacks the document frequencies, counts, split and full Word2Vec
+# model needed for incremental updates, but its bundles still serve predictions
+READABLE_FORMAT_VERSIONS = {1, 2}
+REPRESENTATION_DIR = "representation"
+MANIFEST_FILE = "manifest.json"
+
+
+def _save_terms(path, terms):
+    """
+    Stores a list of terms as one UTF-8 byte array, newline separated.
+
+    A single uint8 array is compact and memory-mappable, unlike a fixed-width
+    unicode array sized by the longest term.
+    """
+    np.save(path, np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8))
+
+
+def _load_terms(path):
+    """
+    Reads back a list of terms stored by _save_terms.
+    """
+    blob = np.load(path, mmap_mode="r")
+    if blob.size == 0:
+        return []
+    return blob.tobytes().decode("utf-8").split("\n")
+
+
+def _write_manifest(directory, manifest):
+    with open(Path(directory) / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4, ensure_ascii=False)
+
+
+def _read_manifest(directory):
+    path = Path(directory) / MANIFEST_FILE
+    if not path.exists():
+        raise FileNotFoundError(f"Artifact manifest not found: {path}")
+
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") not in READABLE_FORMAT_VERSIONS:
+        raise ValueError(
+            f"Unsupported artifact format version {manifest.get('format_version')} in {path}, "
+            f"expected one of {sorted(READABLE_FORMAT_VERSIONS)}"
+        )
+    return manifest
+
+
+def read_representation_manifest(artifact_dir):
+    """
+    Reads the manifest of a saved representation that can be updated in place.
+
+    Raises:
+        ValueError: If the representation was saved with an older format.
+    """
+    rep_dir = Path(artifact_dir) / REPRESENTATION_DIR
+    manifest = _read_manifest(rep_dir)
+    if manifest["format_version"] != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"{rep_dir} was saved with artifact format version {manifest['format_version']}, "
+            "which lacks the corpus counts and split needed for incremental updates. "
+            "Run with --mode full --save-artifacts to rebuild it."
+        )
+    return manifest
+
+
+def staging_artifact_dir(artifact_dir):
+    """
+    Returns an empty directory next to artifact_dir where a new run writes its
+    representation and bundles before replace_artifact_dir swaps them in.
+    """
+    artifact_dir = Path(artifact_dir)
+    staging_dir = artifact_dir.with_name(f"{artifact_dir.name}.new")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True)
+    return staging_dir
+
+
+def replace_artifact_dir(staging_dir, artifact_dir):
+    """
+    Replaces artifact_dir with a staged run as a whole, so no bundle of an
+    earlier run is left pointing at the new representation.
+    """
+    artifact_dir = Path(artifact_dir)
+    backup_dir = artifact_dir.with_name(f"{artifact_dir.name}.previous")
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    if artifact_dir.exists():
+        artifact_dir.rename(backup_dir)
+    try:
+        Path(staging_dir).rename(artifact_dir)
+    except OSError:
+        if backup_dir.exists():
+            backup_dir.rename(artifact_dir)
+        raise
+    shutil.rmtree(backup_dir, ignore_errors=True)
+
+
+def save_representation(
+    artifact_dir,
+    method_name,
+    dtype,
+    state,
+    selection_steps=None,
+    split=None,
+    n_documents=None,
+):
+    """
+    Saves the fitted representation of one (base, representation) pair.
+
+    Vocabulary, idf weights, Word2Vec vectors and scaler parameters are stored
+    as raw .npy files so they can be memory-mapped when loaded. The directory is
+    shared by the bundles of every classifier trained on this representation.
+    Document frequencies, raw counts, the split and the full Word2Vec model are
+    kept as well so the representation can be updated incrementally.
+
+    Args:
+        artifact_dir (Path): Directory for this base and representation.
+        method_name (str): Representation method name (e.g. 'BOW').
+        dtype: dtype of the feature matrix the classifiers were trained on.
+        state (dict): Fitted objects returned by the representation function.
+        selection_steps (list): Fitted feature selection steps, if any.
+        split (tuple): Train and test row indices into the base, if known.
+        n_documents (int): Number of documents in the base.
+    """
+    rep_dir = Path(artifact_dir) / REPRESENTATION_DIR
+    rep_dir.mkdir(parents=True, exist_ok=True)
+    files = {}
+
+    if "vocabulary" in state:
+        vocabulary = state["vocabulary"]
+        terms = sorted(vocabulary, key=vocabulary.get)
+        _save_terms(rep_dir / "vocabulary.npy", terms)
+        np.save(rep_dir / "document_frequency.npy", state["document_frequency"])
+        sparse.save_npz(rep_dir / "counts.npz", state["counts"].tocsr())
+        files["vocabulary"] = "vocabulary.npy"
+        files["document_frequency"] = "document_frequency.npy"
+        files["counts"] = "counts.npz"
+
+    if "idf" in state:
+        np.save(rep_dir / "idf.npy", state["idf"])
+        files["idf"] = "idf.npy"
+
+    if "w2v_model" in state:
+        wv = state["w2v_model"].wv
+        np.save(rep_dir / "vectors.npy", wv.vectors)
+        _save_terms(rep_dir / "words.npy", wv.index_to_key)
+        # Full model (with training weights) for incremental updates
+        state["w2v_model"].save(str(rep_dir / "word2vec.model"))
+        files["vectors"] = "vectors.npy"
+        files["words"] = "words.npy"
+        files["word2vec_model"] = "word2vec.model"
+
+    if "scaler" in state:
+        np.save(rep_dir / "scale.npy", state["scaler"].scale_)
+        np.save(rep_dir / "min.npy", state["scaler"].min_)
+        files["scale"] = "scale.npy"
+        files["min"] = "min.npy"
+
+    if selection_steps:
+        joblib.dump(selection_steps, rep_dir / "feature_selection.joblib")
+        files["feature_selection"] = "feature_selection.joblib"
+
+    if split is not None:
+        np.save(rep_dir / "train_index.npy", split[0])
+        np.save(rep_dir / "test_index.npy", split[1])
+        files["train_index"] = "train_index.npy"
+        files["test_index"] = "test_index.npy"
+
+    _write_manifest(
+        rep_dir,
+        {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "representation": method_name,
+            "dtype": np.dtype(dtype).name,
+            "n_documents": n_documents,
+            "files": files,
+        },
+    )
+
+
+def load_representation_state(artifact_dir):
+    """
+    Loads the representation saved by save_representation back into memory.
+
+    Arrays are read fully (not memory-mapped) since the caller is expected
+    to update and save them again.
+
+    Returns:
+        tuple: (representation manifest dict, state dict in the layout returned
+        by the representation functions, plus 'train_index' and 'test_index')
+    """
+    rep_dir = Path(artifact_dir) / REPRESENTATION_DIR
+    manifest = read_representation_manifest(artifact_dir)
+    files = manifest["files"]
+    state = {}
+
+    if "vocabulary" in files:
+        terms = _load_terms(rep_dir / files["vocabulary"])
+        state["vocabulary"] = {term: index for index, term in enumerate(terms)}
+        state["document_frequency"] = np.load(rep_dir / files["document_frequency"])
+        state["counts"] = sparse.load_npz(rep_dir / files["counts"]).tocsr()
+        state["n_documents"] = state["counts"].shape[0]
+
+    if "idf" in files:
+        state["idf"] = np.load(rep_dir / files["idf"])
+
+    if "word2vec_model" in files:
+        state["w2v_model"] = Word2Vec.load(str(rep_dir / files["word2vec_model"]))
+
+    for key in ["train_index", "test_index"]:
+        if key in files:
+            state[key] = np.load(rep_dir / files[key])
+
+    return manifest, state
+
+
+def is_memory_mappable(model):
+    """
+    Tells whether the model's weights stay memory-mapped after joblib.load.
+
+    Tree ensembles built on sklearn's Tree (RandomForest) copy their node and
+    value arrays into the tree when unpickled, so they are fully loaded into
+    each process. Linear models, SVC, MultinomialNB and HistGradientBoosting
+    keep their arrays memory-mapped.
+    """
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None:
+        return True
+    return not any(hasattr(estimator, "tree_") for estimator in estimators)
+
+
+def save_model(artifact_dir, classifier_name, result_data):
+    """
+    Saves a trained classifier next to its representation as a versioned bundle.
+
+    joblib stores the model's numpy arrays unpickled and aligned, so they are
+    memory-mapped on load, except for RandomForest (see is_memory_mappable).
+
+    Returns:
+        Path: The bundle directory.
+    """
+    bundle_dir = Path(artifact_dir) / classifier_name
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+
+    joblib.dump(result_data["model"], bundle_dir / "model.joblib")
+    _write_manifest(
+        bundle_dir,
+        {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "classifier": classifier_name,
+            "model": str(result_data["model"]),
+            "memory_mapped": is_memory_mappable(result_data["model"]),
+            "metrics": {
+                key: result_data[key]
+                for key in ["accuracy", "precision", "recall", "f1_score"]
+            },
+            "representation_dir": f"../{REPRESENTATION_DIR}",
+        },
+    )
+
+    return bundle_dir
+
+
+def list_bundles(artifact_dir):
+    """
+    Returns the classifier bundle directories saved for one representation.
+    """
+    return sorted(
+        path.parent
+        for path in Path(artifact_dir).glob(f"*/{MANIFEST_FILE}")
+        if path.parent.name != REPRESENTATION_DIR
+    )
+
+
+class ArtifactBundle:
+    """
+    Lazily loaded (base, representation, classifier) bundle for inference.
+
+    Only the manifests are read on construction. Arrays and the model are
+    memory-mapped on first use, so worker processes share the same pages.
+    RandomForest models are the exception and are loaded fully into memory.
+    """
+
+    def __init__(self, bundle_dir):
+        self.bundle_dir = Path(bundle_dir)
+        self.manifest = _read_manifest(self.bundle_dir)
+        self.representation_dir = (
+            self.bundle_dir / self.manifest["representation_dir"]
+        ).resolve()
+        self.representation_manifest = _read_manifest(self.representation_dir)
+        self.dtype = np.dtype(self.representation_manifest["dtype"])
+
+    def _array(self, key):
+        filename = self.representation_manifest["files"][key]
+        return np.load(self.representation_dir / filename, mmap_mode="r")
+
+    @cached_property
+    def model(self):
+        model = joblib.load(self.bundle_dir / "model.joblib", mmap_mode="r")
+        if not is_memory_mappable(model):
+            logging.info(
+                f"{self.manifest['classifier']} trees cannot be memory-mapped; "
+                "the model is loaded fully into memory"
+            )
+        return model
+
+    @cached_property
+    def vocabulary(self):
+        terms = _load_terms(self.representation_dir / "vocabulary.npy")
+        return {term: index for index, term in enumerate(terms)}
+
+    @cached_property
+    def word_index(self):
+        words = _load_terms(self.representation_dir / "words.npy")
+        return {word: index for index, word in enumerate(words)}
+
+    @cached_property
+    def selection_steps(self):
+        filename = self.representation_manifest["files"].get("feature_selection")
+        if filename is None:
+            return None
+        return joblib.load(self.representation_dir / filename, mmap_mode="r")
+
+    def transform(self, texts):
+        """
+        Builds the feature matrix for preprocessed texts with the stored representation.
+        """
+        files = self.representation_manifest["files"]
+
+        if "vocabulary" in files:
+            vectorizer = CountVectorizer(vocabulary=self.vocabulary, dtype=self.dtype)
+            matrix = vectorizer.transform(texts)
+            if "idf" in files:
+                matrix = apply_idf(matrix, self._array("idf"), dtype=self.dtype)
+        else:
+            vectors = self._array("vectors")
+            matrix = np.zeros((len(texts), vectors.shape[1]), dtype=self.dtype)
+            for row, text in enumerate(texts):
+                indices = [
+                    self.word_index[word]
+                    for word in word_tokenize(str(text).lower())
+                    if word in self.word_index
+                ]
+                if indices:
+                    matrix[row] = vectors[indices].mean(axis=0, dtype=self.dtype)
+            matrix = matrix * self._array("scale") + self._array("min")
+            matrix = matrix.astype(self.dtype, copy=False)
+
+        if self.selection_steps:
+            matrix = apply_selected_features(self.selection_steps, matrix)
+
+        return matrix
+
+    def predict(self, texts, batch_size=DEFAULT_BATCH_SIZE, n_jobs=None):
+        """Predicts labels for preprocessed texts, transforming them in batches."""
+        return predict_batched(
+            self.model,
+            list(texts),
+            batch_size=batch_size,
+            n_jobs=n_jobs,
+            transform=self.transform,
+        )
+
+    def predict_with_scores(self, texts, batch_size=DEFAULT_BATCH_SIZE, n_jobs=None):
+        """
+        Predicts labels plus probabilities (or decision scores) for preprocessed texts.
+
+        Returns:
+            tuple: (labels, scores, name of the score method)
+        """
+        return predict_with_scores(
+            self.model,
+            list(texts),
+            batch_size=batch_size,
+            n_jobs=n_jobs,
+            transform=self.transform,
+        )
+
+    def evaluate(self, texts, labels):
+        """Re-evaluates the stored model on labeled preprocessed texts."""
+        return compute_metrics(labels, self.predict(texts))
+
+
+def load_bundle(bundle_dir):
+    """
+    Opens an artifact bundle, logging the stored classifier and metrics.
+    """
+    bundle = ArtifactBundle(bundle_dir)
+    logging.info(
+        f"Loaded artifact {bundle.bundle_dir} ({bundle.manifest['classifier']}, "
+        f"{bundle.representation_manifest['representation']})"
+    )
+    return bundle
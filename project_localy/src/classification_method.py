@@ -1,18 +1,212 @@
-from sklearn.ensemble import RandomForestClassifier
+import ctypes
+import gc
+import logging
+import os
+import pickle
+import threading
+import time
+from contextlib import nullcontext
+
+import numpy as np
+from prediction import predict_batched
+from scipy import sparse
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.svm import SVC
 
+# Rough working set of one tree-building worker per training sample: the grown
+# tree nodes plus the sample index, feature value and weight buffers.
+TREE_WORKER_BYTES_PER_SAMPLE = 256
 
-def svc_classifier(x_train, y_train, x_test, y_test):
-    """Train and evaluate SVC with linear kernel."""
-    model = SVC(kernel="linear", C=1.0)
-    model.fit(x_train, y_train)
-    y_pred = model.predict(x_test)
 
+def _read_proc_bytes(path, field):
+    """Return a 'Field: <n> kB' entry of a /proc file in bytes, or None if unknown."""
+    try:
+        with open(path) as proc_file:
+            for line in proc_file:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def available_memory_bytes():
+    """Return the physical memory currently available, or None if unknown."""
+    # MemAvailable counts reclaimable page cache, unlike the free pages of sysconf
+    available = _read_proc_bytes("/proc/meminfo", "MemAvailable")
+    if available is not None:
+        return available
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def current_rss_bytes():
+    """Return the resident set size of this process in bytes, or None if unknown."""
+    return _read_proc_bytes("/proc/self/status", "VmRSS")
+
+
+def _release_free_heap():
+    """Return freed heap memory to the OS (glibc), so that reused memory shows in RSS."""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _reset_peak_rss():
+    """Reset the kernel's RSS high-water mark (VmHWM) of this process on Linux."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class PeakRssTracker:
+    """
+    Context manager recording the peak resident set size while its block runs.
+
+    On Linux the high-water mark is reset through /proc/self/clear_refs and read
+    back on exit, which adds no overhead. When the reset is not permitted, RSS is
+    sampled from a background thread instead. Where /proc is unavailable, the
+    peak is None.
+    """
+
+    # Trackers entered and not yet exited, so that a nested reset of the
+    # high-water mark does not hide the peak reached before it from outer ones
+    _active: list["PeakRssTracker"] = []
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.baseline_bytes = None
+        self.peak_bytes = None
+        self._use_hwm = False
+        self._sampler = None
+
+    def __enter__(self):
+        gc.collect()
+        _release_free_heap()
+        self.baseline_bytes = current_rss_bytes()
+        if self.baseline_bytes is None:
+            return self
+
+        hwm = _read_proc_bytes("/proc/self/status", "VmHWM")
+        for tracker in PeakRssTracker._active:
+            tracker._carry(hwm)
+        self._use_hwm = _reset_peak_rss()
+        self.peak_bytes = self.baseline_bytes
+
+        if not self._use_hwm:
+            self._stop = threading.Event()
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+        PeakRssTracker._active.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.baseline_bytes is None:
+            return False
+
+        PeakRssTracker._active.remove(self)
+        if self._use_hwm:
+            self._carry(_read_proc_bytes("/proc/self/status", "VmHWM"))
+        else:
+            self._stop.set()
+            self._sampler.join()
+        self._carry(current_rss_bytes())
+        return False
+
+    def _carry(self, rss_bytes):
+        if rss_bytes is not None and self.peak_bytes is not None:
+            self.peak_bytes = max(self.peak_bytes, rss_bytes)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._carry(current_rss_bytes())
+
+    @property
+    def peak_mb(self):
+        """Peak RSS of the process during the block, in MB."""
+        if self.peak_bytes is None:
+            return None
+        return self.peak_bytes / 1024**2
+
+    @property
+    def increase_mb(self):
+        """Peak RSS during the block minus the RSS when it started, in MB."""
+        if self.peak_bytes is None:
+            return None
+        return (self.peak_bytes - self.baseline_bytes) / 1024**2
+
+
+class _ByteCounter:
+    """File-like sink that counts the bytes written to it and discards them."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+
+def model_size_mb(model):
+    """
+    Return the serialized size of a fitted model in MB.
+
+    The pickle is streamed into a byte counter, so no second copy of the model
+    is held in memory.
+    """
+    counter = _ByteCounter()
+    pickle.dump(model, counter, protocol=pickle.HIGHEST_PROTOCOL)
+    return counter.size / 1024**2
+
+
+def memory_capped_n_jobs(x_train, n_estimators, memory_fraction=0.5):
+    """
+    Choose how many trees to build in parallel without exceeding available RAM.
+
+    Workers share the training matrix, so only the per-tree working set is
+    multiplied by the number of jobs.
+    """
+    max_jobs = min(os.cpu_count() or 1, n_estimators)
+    available = available_memory_bytes()
+    if available is None:
+        return max_jobs
+
+    budget = available * memory_fraction
+    per_worker = x_train.shape[0] * TREE_WORKER_BYTES_PER_SAMPLE
+    return int(max(1, min(max_jobs, budget // per_worker)))
+
+
+def to_float32(matrix):
+    """Cast a dense or sparse feature matrix to float32 without copying if already float32."""
+    if sparse.issparse(matrix):
+        return matrix.astype(np.float32, copy=False)
+    return np.asarray(matrix, dtype=np.float32)
+
+
+def fitted_input_dtype(model):
+    """
+    Return the dtype the model converted its training matrix to, or None if the
+    fitted attributes do not tell (trees and naive Bayes keep no copy of it).
+    """
+    for attribute in ("support_vectors_", "coef_"):
+        fitted = getattr(model, attribute, None)
+        if fitted is not None:
+            return fitted.dtype
+    return None
+
+
+def compute_metrics(y_test, y_pred):
+    """Compute accuracy and weighted precision, recall and F1-score."""
     return {
-        "model": model,
         "accuracy": accuracy_score(y_test, y_pred),
         "precision": precision_score(
             y_test, y_pred, average="weighted", zero_division=0
@@ -23,40 +217,68 @@ def svc_classifier(x_train, y_train, x_test, y_test):
     }
 
 
-def logistic_regression_classifier(x_train, y_train, x_test, y_test):
-    """Train and evaluate Logistic Regression."""
-    model = LogisticRegression(max_iter=500)
-    model.fit(x_train, y_train)
-    y_pred = model.predict(x_test)
+def evaluate_model(model, x_train, y_train, x_test, y_test, track_memory=False):
+    """
+    Fit the model, predict on the test split and compute weighted metrics.
 
-    return {
+    With track_memory, the peak RSS during the fit and its increase over the RSS
+    before the fit are added as peak_rss_mb and fit_memory_mb.
+    """
+    tracker = PeakRssTracker() if track_memory else nullcontext()
+    with tracker:
+        start = time.perf_counter()
+        model.fit(x_train, y_train)
+        fit_time = time.perf_counter() - start
+
+    fit_dtype = fitted_input_dtype(model)
+    if (
+        x_train.dtype == np.float32
+        and fit_dtype is not None
+        and fit_dtype != np.float32
+    ):
+        logging.warning(
+            f"{type(model).__name__} upcast the float32 training matrix to {fit_dtype}"
+        )
+
+    start = time.perf_counter()
+    y_pred = predict_batched(model, x_test)
+    predict_time = time.perf_counter() - start
+
+    result = {
         "model": model,
-        "accuracy": accuracy_score(y_test, y_pred),
-        "precision": precision_score(
-            y_test, y_pred, average="weighted", zero_division=0
-        ),
-        "recall": recall_score(y_test, y_pred, average="weighted", zero_division=0),
-        "f1_score": f1_score(y_test, y_pred, average="weighted", zero_division=0),
-        # "confusion_matrix": confusion_matrix(y_test, y_pred),
+        **compute_metrics(y_test, y_pred),
+        "fit_time": fit_time,
+        "predict_time": predict_time,
     }
+    if track_memory:
+        result["peak_rss_mb"] = tracker.peak_mb
+        result["fit_memory_mb"] = tracker.increase_mb
+
+    return result
+
+
+def svc_classifier(x_train, y_train, x_test, y_test):
+    """Train and evaluate SVC with linear kernel."""
+    model = SVC(kernel="linear", C=1.0)
+    return evaluate_model(model, x_train, y_train, x_test, y_test)
+
+
+def logistic_regression_classifier(x_train, y_train, x_test, y_test):
+    """
+    Train and evaluate Logistic Regression.
+
+    On float32 features newton-cg is used, since lbfgs copies the training
+    matrix to float64 (scikit-learn 1.6); both minimize the same objective.
+    """
+    solver = "newton-cg" if x_train.dtype == np.float32 else "lbfgs"
+    model = LogisticRegression(max_iter=500, solver=solver)
+    return evaluate_model(model, x_train, y_train, x_test, y_test)
 
 
 def multinomial_nb_classifier(x_train, y_train, x_test, y_test):
     """Train and evaluate Multinomial Naive Bayes."""
     model = MultinomialNB(alpha=1.0)
-    model.fit(x_train, y_train)
-    y_pred = model.predict(x_test)
-
-    return {
-        "model": model,
-        "accuracy": accuracy_score(y_test, y_pred),
-        "precision": precision_score(
-            y_test, y_pred, average="weighted", zero_division=0
-        ),
-        "recall": recall_score(y_test, y_pred, average="weighted", zero_division=0),
-        "f1_score": f1_score(y_test, y_pred, average="weighted", zero_division=0),
-        # "confusion_matrix": confusion_matrix(y_test, y_pred),
-    }
+    return evaluate_model(model, x_train, y_train, x_test, y_test)
 
 
 def random_forest_classifier(x_train, y_train, x_test, y_test):
@@ -64,16 +286,44 @@ def random_forest_classifier(x_train, y_train, x_test, y_test):
     model = RandomForestClassifier(
         n_estimators=100, max_depth=None, random_state=42, n_jobs=-1
     )
-    model.fit(x_train, y_train)
-    y_pred = model.predict(x_test)
+    return evaluate_model(model, x_train, y_train, x_test, y_test)
 
-    return {
-        "model": model,
-        "accuracy": accuracy_score(y_test, y_pred),
-        "precision": precision_score(
-            y_test, y_pred, average="weighted", zero_division=0
-        ),
-        "recall": recall_score(y_test, y_pred, average="weighted", zero_division=0),
-        "f1_score": f1_score(y_test, y_pred, average="weighted", zero_division=0),
-        # "confusion_matrix": confusion_matrix(y_test, y_pred),
-    }
+
+def random_forest_memory_capped_classifier(x_train, y_train, x_test, y_test):
+    """Train and evaluate Random Forest on float32 features with RAM-capped workers."""
+    x_train = to_float32(x_train)
+    x_test = to_float32(x_test)
+
+    n_estimators = 100
+    n_jobs = memory_capped_n_jobs(x_train, n_estimators)
+    logging.info(f"Memory-capped RandomForest using {n_jobs} workers")
+
+    model = RandomForestClassifier(
+        n_estimators=n_estimators, max_depth=None, random_state=42, n_jobs=n_jobs
+    )
+    result = evaluate_model(model, x_train, y_train, x_test, y_test, track_memory=True)
+    result["n_jobs"] = n_jobs
+    result["model_size_mb"] = model_size_mb(model)
+
+    return result
+
+
+def hist_gradient_boosting_classifier(x_train, y_train, x_test, y_test):
+    """Train and evaluate histogram-based gradient boosting on dense features."""
+    if sparse.issparse(x_train):
+        raise ValueError(
+            "HistGradientBoosting requires dense features (e.g. Word2Vec)."
+        )
+
+    model = HistGradientBoostingClassifier(max_iter=100, random_state=42)
+    result = evaluate_model(
+        model,
+        to_float32(x_train),
+        y_train,
+        to_float32(x_test),
+        y_test,
+        track_memory=True,
+    )
+    result["model_size_mb"] = model_size_mb(model)
+
+    return result
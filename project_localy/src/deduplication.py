@@ -0,0 +1,205 @@
+import logging
+import zlib
+
+import numpy as np
+import pandas as pd
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingle_hashes(text, k=5):
+    """
+    Hashes the word k-grams (shingles) of a preprocessed text into 32-bit ints.
+
+    Texts shorter than k words are represented by a single shingle.
+    """
+    words = str(text).split()
+    if len(words) < k:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i : i + k]) for i in range(len(words) - k + 1)]
+
+    return np.unique(
+        np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) for gram in grams),
+            dtype=np.uint64,
+            count=len(grams),
+        )
+    )
+
+
+def minhash_signatures(texts, num_perm=128, k=5, seed=42):
+    """
+    Computes a MinHash signature of num_perm values for every text.
+
+    Each permutation is a universal hash (a * x + b) mod p over the shingle hashes;
+    the fraction of equal signature values estimates the Jaccard similarity.
+    """
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64)
+    b = rng.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64)
+    a = (a.astype(np.uint64) % MERSENNE_PRIME)[:, None]
+    b = (b.astype(np.uint64) % MERSENNE_PRIME)[:, None]
+
+    signatures = np.full((len(texts), num_perm), MAX_HASH, dtype=np.uint64)
+    for row, text in enumerate(texts):
+        hashes = shingle_hashes(text, k=k)
+        if hashes.size:
+            permuted = ((a * hashes[None, :] + b) % MERSENNE_PRIME) & MAX_HASH
+            signatures[row] = permuted.min(axis=1)
+
+    return signatures
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def duplicate_clusters(texts, threshold=0.8, num_perm=128, bands=32, k=5):
+    """
+    Groups near-duplicate texts with MinHash and locality-sensitive hashing.
+
+    Signatures are cut into bands; texts sharing a band bucket become candidates
+    and are merged when their estimated Jaccard similarity reaches the threshold.
+    Each candidate is only compared with the first text of its bucket, which keeps
+    the cost linear in the number of texts.
+
+    Returns:
+        np.ndarray: Cluster id per text (the index of the cluster's first text).
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+
+    signatures = minhash_signatures(texts, num_perm=num_perm, k=k)
+    rows = num_perm // bands
+    parent = np.arange(len(texts))
+
+    for band in range(bands):
+        band_values = signatures[:, band * rows : (band + 1) * rows]
+        buckets = {}
+        for i, key in enumerate(map(bytes, band_values)):
+            head = buckets.setdefault(key, i)
+            if head == i:
+                continue
+            root_head, root_i = _find(parent, head), _find(parent, i)
+            if root_head == root_i:
+                continue
+            similarity = np.mean(signatures[head] == signatures[i])
+            if similarity >= threshold:
+                parent[max(root_head, root_i)] = min(root_head, root_i)
+
+    return np.array([_find(parent, i) for i in range(len(texts))])
+
+
+def match_new_texts(
+    existing_texts, new_texts, threshold=0.8, num_perm=128, bands=32, k=5
+):
+    """
+    Finds an earlier near-duplicate for each new text, among the existing texts
+    and the new texts before it.
+
+    Each new text is only compared with texts before it, so the matches found
+    for earlier texts never change when more texts are appended.
+
+    Returns:
+        np.ndarray: Per new text, the index of its match in existing_texts
+        followed by new_texts, or -1 when it has none.
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+
+    texts = list(existing_texts) + list(new_texts)
+    signatures = minhash_signatures(texts, num_perm=num_perm, k=k)
+    rows = num_perm // bands
+    n_existing = len(existing_texts)
+    buckets = [{} for _ in range(bands)]
+    matches = np.full(len(new_texts), -1)
+
+    for i in range(len(texts)):
+        keys = [
+            bytes(signatures[i, band * rows : (band + 1) * rows])
+            for band in range(bands)
+        ]
+        if i >= n_existing:
+            candidates = sorted(
+                {j for band, key in enumerate(keys) for j in buckets[band].get(key, ())}
+            )
+            for j in candidates:
+                if np.mean(signatures[i] == signatures[j]) >= threshold:
+                    matches[i - n_existing] = j
+                    break
+        for band, key in enumerate(keys):
+            buckets[band].setdefault(key, []).append(i)
+
+    return matches
+
+
+def deduplicate_corpora(frames, mode="report", threshold=0.8):
+    """
+    Detects near-duplicate articles within and across corpora.
+
+    Args:
+        frames (list): (corpus name, DataFrame) pairs with 'FullText' and 'Classe'.
+            Earlier frames take precedence when duplicates are dropped.
+        mode (str): 'report' only logs the duplicate clusters, 'drop' keeps the
+            first article of each cluster, and 'group' adds a 'DupGroup' column so
+            that duplicates stay on the same side of the train/test split.
+        threshold (float): Minimum estimated Jaccard similarity of the shingles.
+
+    Returns:
+        tuple: (list of DataFrames in the same order, report dict per corpus)
+    """
+    if mode not in {"report", "drop", "group"}:
+        raise ValueError(f"Unknown dedup mode: {mode}")
+
+    combined = pd.concat(
+        [
+            df.assign(_frame=position, _corpus=name)
+            for position, (name, df) in enumerate(frames)
+        ],
+        ignore_index=True,
+    )
+    combined["DupGroup"] = duplicate_clusters(
+        combined["FullText"].tolist(), threshold=threshold
+    )
+
+    cluster_size = combined.groupby("DupGroup")["FullText"].transform("size")
+    is_copy = combined.duplicated("DupGroup", keep="first")
+    cluster_corpora = combined.groupby("DupGroup")["_corpus"].transform("nunique")
+    cluster_labels = combined.groupby("DupGroup")["Classe"].transform("nunique")
+
+    report = {}
+    for name, rows in combined.groupby("_corpus", sort=False):
+        in_cluster = cluster_size[rows.index] > 1
+        report[name] = {
+            "documents": len(rows),
+            "documents_in_duplicate_clusters": int(in_cluster.sum()),
+            "duplicate_clusters": int(rows.loc[in_cluster, "DupGroup"].nunique()),
+            "redundant_copies": int(is_copy[rows.index].sum()),
+            "cross_corpus_clusters": int(
+                rows.loc[cluster_corpora[rows.index] > 1, "DupGroup"].nunique()
+            ),
+            "conflicting_label_clusters": int(
+                rows.loc[cluster_labels[rows.index] > 1, "DupGroup"].nunique()
+            ),
+        }
+        logging.info(f"Duplicates in {name}: {report[name]}")
+
+    if mode == "drop":
+        combined = combined[~is_copy]
+        logging.info(f"Dropped {int(is_copy.sum())} near-duplicate articles")
+
+    deduplicated = []
+    for position in range(len(frames)):
+        df = combined[combined["_frame"] == position].drop(
+            columns=["_frame", "_corpus"]
+        )
+        if mode != "group":
+            df = df.drop(columns=["DupGroup"])
+        deduplicated.append(df.reset_index(drop=True))
+
+    return deduplicated, report
@@ -1,26 +1,428 @@
 import argparse
 import json
 import logging
+import os
+import time
 from pathlib import Path
 
 import nltk
+import numpy as np
 import pandas as pd
+from artifacts import load_bundle
+from deduplication import deduplicate_corpora
+from feature_selection import validate_config
+from hyperparameter_search import tune_classifiers
+from incremental_update import (
+    merge_added_articles,
+    read_new_articles,
+    save_cached_base,
+    update_base,
+)
 from plot_heatmap import plot_heatmap_metric
 from plot_radar import plot_radar_metric_per_dataset
+from prediction import DEFAULT_BATCH_SIZE
 from read_boatosbr import read_BoatosBR
 from read_fakebr import read_Fakebr
 from read_fakerecogna import read_FakeRecogna
 from read_faketrue import read_FakeTrue
-from utils import fill_results, load_json, run_classification_methods
+from scaling_benchmark import DEFAULT_FRACTIONS, run_scaling_benchmark
+from utils import (
+    compare_results,
+    fill_results,
+    load_json,
+    load_token_cache,
+    metrics_out_of_tolerance,
+    preprocess_text,
+    run_classification_methods,
+    save_token_cache,
+)
+
+# (method name, results key, log label, results file key)
+REPRESENTATIONS = [
+    ("BOW", "BOW", "BoW", "bow"),
+    ("TFIDF", "TFIDF", "TF-IDF", "tfidf"),
+    ("function_Word2Vec", "Word2Vec", "Word2Vec", "word2vec"),
+]
+
+FLOAT32_METRIC_TOLERANCE = 0.01
+TOKEN_CACHE_PATH = Path("cache") / "token_cache.json"
+
+
+def download_nltk_resources():
+    """
+    Downloads the NLTK resources used by the preprocessing and representations.
+    """
+
+    logging.info("Downloading required NLTK resources...")
+    nltk.download("punkt")
+    nltk.download("stopwords")
+    nltk.download("wordnet")
+    nltk.download("punkt_tab")
+
+
+def load_bases(dedup="off", dedup_threshold=0.8, cache_bases=False):
+    """
+    Downloads the NLTK resources, reads the four corpora and builds the
+    nested bases (Base 1 to Base 4) with increasing data amounts. Articles
+    added by earlier incremental updates are appended to each base.
+
+    Args:
+        dedup (str): Near-duplicate handling: 'off', 'report', 'drop' or 'group'.
+        dedup_threshold (float): Jaccard similarity above which articles are duplicates.
+        cache_bases (bool): Whether to cache the preprocessed bases for incremental
+            updates. Only runs that save artifacts should do so, so that the cache
+            matches the saved representations.
+
+    Returns:
+        list: DataFrames for Base 1 to Base 4, each with 'FullText' and 'Classe'.
+    """
+
+    download_nltk_resources()
+    load_token_cache(TOKEN_CACHE_PATH)
+
+    logging.info("Loading datasets...")
+    df_fake_recogna_true, df_fake_recogna_false = read_FakeRecogna()
+    df_fakebr_true, df_fakebr_false = read_Fakebr()
+    df_faketrue_true, df_faketrue_false = read_FakeTrue()
+    df_boatosbr_true, df_boatosbr_false = read_BoatosBR()
+    save_token_cache(TOKEN_CACHE_PATH)
+
+    # Balance dataset sample size for BoatosBR false class
+    df_boatosbr_false = df_boatosbr_false.sample(n=1516, random_state=42).reset_index(
+        drop=True
+    )
+
+    if dedup != "off":
+        logging.info("Detecting near-duplicate articles...")
+        frames, report = deduplicate_corpora(
+            [
+                ("Fake.br", df_fakebr_true),
+                ("Fake.br", df_fakebr_false),
+                ("FakeRecogna", df_fake_recogna_true),
+                ("FakeRecogna", df_fake_recogna_false),
+                ("FakeTrue.Br", df_faketrue_true),
+                ("FakeTrue.Br", df_faketrue_false),
+                ("BoatosBR", df_boatosbr_true),
+                ("BoatosBR", df_boatosbr_false),
+            ],
+            mode=dedup,
+            threshold=dedup_threshold,
+        )
+        (
+            df_fakebr_true,
+            df_fakebr_false,
+            df_fake_recogna_true,
+            df_fake_recogna_false,
+            df_faketrue_true,
+            df_faketrue_false,
+            df_boatosbr_true,
+            df_boatosbr_false,
+        ) = frames
+
+        report_path = Path("results") / "dedup_report.json"
+        report_path.parent.mkdir(exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        logging.info(f"Duplicate report saved to: {report_path}")
+
+    # Define datasets (bases) with increasing data amounts
+    data1 = pd.concat([df_fakebr_true, df_fakebr_false], ignore_index=True)
+    data2 = pd.concat(
+        [
+            df_fakebr_true,
+            df_fakebr_false,
+            df_fake_recogna_true,
+            df_fake_recogna_false,
+        ],
+        ignore_index=True,
+    )
+    data3 = pd.concat(
+        [
+            df_fakebr_true,
+            df_fakebr_false,
+            df_fake_recogna_true,
+            df_fake_recogna_false,
+            df_faketrue_true,
+            df_faketrue_false,
+        ],
+        ignore_index=True,
+    )
+    data4 = pd.concat(
+        [
+            df_fakebr_true,
+            df_fakebr_false,
+            df_fake_recogna_true,
+            df_fake_recogna_false,
+            df_faketrue_true,
+            df_faketrue_false,
+            df_boatosbr_true,
+            df_boatosbr_false,
+        ],
+        ignore_index=True,
+    )
+
+    bases = [data1, data2, data3, data4]
+    for i, data in enumerate(bases, start=1):
+        if cache_bases:
+            save_cached_base(i, data)
+        bases[i - 1] = merge_added_articles(i, data, dedup, dedup_threshold)
+
+    return bases
+
+
+def results_suffix(selection_config, dtype):
+    """
+    Returns the file suffix that keeps experiment variants (feature selection,
+    float32) apart from the baseline results and artifacts.
+    """
+    suffix = ""
+    if selection_config:
+        suffix += "_fs"
+    if dtype is not None:
+        suffix += "_float32"
+    return suffix
+
+
+def run_tuning(args, bases, feature_selection):
+    """
+    Runs the successive halving search for every representation and base and
+    saves the best configurations, scores and timings.
+    """
+
+    dtype = np.float32 if args.precision == "float32" else None
+
+    results_dir = Path("results")
+    results_dir.mkdir(exist_ok=True)
+    for method_name, method_key, label, file_key in REPRESENTATIONS:
+        logging.info(
+            f"Starting hyperparameter search for {label} representation method"
+        )
+        results = {}
+        for i, data in enumerate(bases, start=1):
+            results[f"Base {i}"] = {
+                method_key: tune_classifiers(
+                    method_name,
+                    data,
+                    feature_selection=feature_selection.get(method_key),
+                    dtype=dtype,
+                )
+            }
+
+        suffix = results_suffix(feature_selection.get(method_key), dtype)
+        results_path = results_dir / f"results_tuning_{file_key}{suffix}.json"
+        with open(results_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+        logging.info(f"Tuning results saved to: {results_path}")
+
+
+def run_scaling(args, bases, feature_selection):
+    """
+    Runs the scaling benchmark for every representation and base over the
+    requested data fractions and saves the measured curves.
+    """
+
+    dtype = np.float32 if args.precision == "float32" else None
+
+    results_dir = Path("results")
+    results_dir.mkdir(exist_ok=True)
+    for method_name, method_key, label, file_key in REPRESENTATIONS:
+        logging.info(f"Starting scaling benchmark for {label} representation method")
+        results = {}
+        for i, data in enumerate(bases, start=1):
+            results[f"Base {i}"] = {
+                method_key: run_scaling_benchmark(
+                    method_name,
+                    data,
+                    fractions=args.fractions,
+                    feature_selection=feature_selection.get(method_key),
+                    dtype=dtype,
+                    memory_capped_rf=args.memory_capped_rf,
+                )
+            }
+
+        suffix = results_suffix(feature_selection.get(method_key), dtype)
+        results_path = results_dir / f"results_scaling_{file_key}{suffix}.json"
+        with open(results_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+        logging.info(f"Scaling results saved to: {results_path}")
+
+
+def run_update(args):
+    """
+    Appends newly labeled articles to the cached bases and incrementally
+    updates their saved representations and classifiers.
+    """
+
+    if not args.new_data:
+        raise ValueError("--mode update requires --new-data")
+
+    download_nltk_resources()
+    load_token_cache(TOKEN_CACHE_PATH)
+    new_df = read_new_articles(args.new_data)
+    save_token_cache(TOKEN_CACHE_PATH)
+    if args.dedup == "off":
+        logging.warning(
+            "New articles are not checked for near-duplicates. Pass the --dedup "
+            "mode the artifacts were trained with to keep duplicates out of the test split."
+        )
+
+    results_dir = Path("results")
+    for base_number in args.update_bases:
+        start = time.perf_counter()
+        results = update_base(
+            base_number,
+            new_df,
+            results_dir / "artifacts",
+            dedup=args.dedup,
+            dedup_threshold=args.dedup_threshold,
+        )
+        logging.info(
+            f"Base {base_number} updated in {time.perf_counter() - start:.1f}s"
+        )
+
+        results_path = results_dir / f"results_update_base_{base_number}.json"
+        with open(results_path, "w", encoding="utf-8") as f:
+            json.dump({f"Base {base_number}": results}, f, indent=4, ensure_ascii=False)
+        logging.info(f"Update results saved to: {results_path}")
+
+
+def run_predict(args):
+    """
+    Scores a CSV of articles with a saved artifact bundle and writes labels and
+    scores to a CSV file.
+
+    The input is read, preprocessed and scored one block of rows at a time (one
+    batch per prediction thread) and each block is appended to the output, so
+    memory does not grow with the number of articles.
+    """
+
+    if not args.artifact or not args.input:
+        raise ValueError("--mode predict requires --artifact and --input")
+
+    download_nltk_resources()
+    load_token_cache(TOKEN_CACHE_PATH)
+    bundle = load_bundle(args.artifact)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    # Written under a temporary name so a failed run leaves no partial output
+    tmp_path = output_path.with_suffix(".tmp")
+
+    rows_per_block = args.batch_size * (args.n_jobs or os.cpu_count() or 1)
+    n_articles = 0
+    start = time.perf_counter()
+    for df_input in pd.read_csv(args.input, chunksize=rows_per_block):
+        if "FullText" not in df_input.columns:
+            raise ValueError(
+                f"Expected column 'FullText' missing in {args.input}. Found: {set(df_input.columns)}"
+            )
+        if df_input.empty:
+            continue
+        texts = df_input["FullText"].astype(str).apply(preprocess_text).tolist()
+        labels, scores, method = bundle.predict_with_scores(
+            texts, batch_size=args.batch_size, n_jobs=args.n_jobs
+        )
+
+        df_output = pd.DataFrame({"prediction": labels})
+        if scores.ndim == 1:
+            df_output["score"] = scores
+        else:
+            for column, label in enumerate(bundle.model.classes_):
+                df_output[f"score_{label}"] = scores[:, column]
+
+        df_output.to_csv(
+            tmp_path,
+            mode="w" if n_articles == 0 else "a",
+            header=n_articles == 0,
+            index=False,
+        )
+        n_articles += len(df_output)
+
+    save_token_cache(TOKEN_CACHE_PATH)
+    if n_articles == 0:
+        raise ValueError(f"No articles to score in {args.input}")
+
+    os.replace(tmp_path, output_path)
+    logging.info(
+        f"Scored {n_articles} articles in {time.perf_counter() - start:.2f}s using {method}"
+    )
+    logging.info(f"Predictions saved to: {output_path}")
+
+
+def run_full(args, bases, feature_selection):
+    """
+    Runs every representation and classifier on each base and saves the results.
+
+    Returns:
+        dict: Results per representation key ('BOW', 'TFIDF', 'Word2Vec').
+    """
+
+    dtype = np.float32 if args.precision == "float32" else None
+
+    results_dir = Path("results")
+    results_dir.mkdir(exist_ok=True)
+    results = {}
+    for method_name, method_key, label, file_key in REPRESENTATIONS:
+        logging.info(f"Starting processing for {label} representation method")
+        selection_config = feature_selection.get(method_key)
+        suffix = results_suffix(selection_config, dtype)
+        results[method_key] = {f"Base {i}": {} for i in range(1, 5)}
+        for i, data in enumerate(bases, start=1):
+            res = run_classification_methods(
+                method_name,
+                data,
+                feature_selection=selection_config,
+                memory_capped_rf=args.memory_capped_rf,
+                dtype=dtype,
+                artifact_dir=(
+                    results_dir / "artifacts" / f"Base_{i}" / f"{method_key}{suffix}"
+                    if args.save_artifacts
+                    else None
+                ),
+            )
+            fill_results(f"Base {i}", res, method_key, results[method_key])
+
+        results_path = results_dir / f"results_{file_key}{suffix}.json"
+        with open(results_path, "w", encoding="utf-8") as f:
+            json.dump(results[method_key], f, indent=4, ensure_ascii=False)
+        logging.info(f"Results saved to: {results_path}")
+
+        baseline_path = results_dir / f"results_{file_key}.json"
+        if suffix and baseline_path.exists():
+            comparison = compare_results(load_json(baseline_path), results[method_key])
+            report_path = results_dir / f"comparison_{file_key}{suffix}.json"
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(comparison, f, indent=4, ensure_ascii=False)
+            logging.info(f"Comparison with baseline saved to: {report_path}")
+
+            # Lower precision alone must not change the metrics
+            if dtype is not None and not selection_config:
+                mismatches = metrics_out_of_tolerance(
+                    comparison, FLOAT32_METRIC_TOLERANCE
+                )
+                for base, _, classifier, metric, delta in mismatches:
+                    logging.warning(
+                        f"float32 {label} {classifier} on {base}: {metric} differs by {delta:+.4f}"
+                    )
+                if not mismatches:
+                    logging.info(
+                        f"float32 {label} metrics match the baseline within {FLOAT32_METRIC_TOLERANCE}"
+                    )
+
+    return results
 
 
 def main() -> None:
     """
     Main entry point of the fake news classification pipeline.
 
-    Parses command-line arguments to run the pipeline in two modes:
+    Parses command-line arguments to run the pipeline in six modes:
     - "full": Runs full data processing, model training, evaluation, and saves results.
     - "charts": Loads previously saved results and generates plots.
+    - "tune": Runs a successive halving hyperparameter search and saves the best configs.
+    - "scaling": Measures cost and metrics over increasing fractions of each base.
+    - "update": Incrementally retrains saved artifacts with newly labeled articles.
+    - "predict": Scores new articles with a saved artifact in batches.
 
     No input parameters (arguments are parsed internally).
 
@@ -37,101 +439,134 @@ def main() -> None:
     parser = argparse.ArgumentParser(description="Fake news classification pipeline")
     parser.add_argument(
         "--mode",
-        choices=["full", "charts"],
+        choices=["full", "charts", "tune", "scaling", "update", "predict"],
         required=True,
-        help="Execution mode: 'full' to process everything, 'charts' to generate plots from existing results",
+        help="Execution mode: 'full' to process everything, 'charts' to generate plots from existing results, "
+        "'tune' to search classifier hyperparameters, 'scaling' to benchmark cost against data size, "
+        "'update' to retrain saved artifacts with new articles, 'predict' to score articles with a saved artifact",
+    )
+    parser.add_argument(
+        "--feature-selection",
+        metavar="CONFIG_JSON",
+        help="JSON file mapping 'BOW', 'TFIDF' and/or 'Word2Vec' to feature selection options "
+        "(min_df, max_df, chi2_k, svd_components) applied before classification",
+    )
+    parser.add_argument(
+        "--memory-capped-rf",
+        action="store_true",
+        help="Train RandomForest on float32 features with workers capped by available RAM, "
+        "and add HistGradientBoosting for dense (Word2Vec) features",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=["float64", "float32"],
+        default="float64",
+        help="Floating point precision of the feature matrices from representation to classification",
+    )
+    parser.add_argument(
+        "--save-artifacts",
+        action="store_true",
+        help="Save the fitted representations and classifiers under results/artifacts",
+    )
+    parser.add_argument(
+        "--fractions",
+        nargs="+",
+        type=float,
+        default=DEFAULT_FRACTIONS,
+        help="Fractions of each base used by the scaling benchmark",
+    )
+    parser.add_argument(
+        "--new-data",
+        metavar="CSV",
+        help="CSV file with new labeled articles ('FullText', 'Classe') for --mode update",
+    )
+    parser.add_argument(
+        "--update-bases",
+        nargs="+",
+        type=int,
+        default=[4],
+        choices=[1, 2, 3, 4],
+        help="Bases that receive the new articles in --mode update",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=["off", "report", "drop", "group"],
+        default="off",
+        help="Near-duplicate articles: 'report' clusters per corpus, 'drop' keeps one article per cluster, "
+        "'group' keeps clusters on one side of the train/test split",
+    )
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=0.8,
+        help="Estimated Jaccard similarity of word 5-gram shingles above which articles are duplicates",
+    )
+    parser.add_argument(
+        "--artifact",
+        metavar="BUNDLE_DIR",
+        help="Artifact bundle used by --mode predict (e.g. results/artifacts/Base_4/TFIDF/SVC)",
+    )
+    parser.add_argument(
+        "--input",
+        metavar="CSV",
+        help="CSV file with a 'FullText' column to score in --mode predict",
+    )
+    parser.add_argument(
+        "--output",
+        default="results/predictions.csv",
+        help="Where --mode predict writes labels and scores",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Rows per prediction batch in --mode predict",
+    )
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=None,
+        help=(
+            "Prediction threads in --mode predict (defaults to the number of CPUs; "
+            "models that predict in parallel themselves use one)"
+        ),
     )
     args = parser.parse_args()
 
-    if args.mode == "full":
-        logging.info("Downloading required NLTK resources...")
-        nltk.download("punkt")
-        nltk.download("stopwords")
-        nltk.download("wordnet")
-        nltk.download("punkt_tab")
-
-        logging.info("Loading datasets...")
-        df_fake_recogna_true, df_fake_recogna_false = read_FakeRecogna()
-        df_fakebr_true, df_fakebr_false = read_Fakebr()
-        df_faketrue_true, df_faketrue_false = read_FakeTrue()
-        df_boatosbr_true, df_boatosbr_false = read_BoatosBR()
-
-        # Balance dataset sample size for BoatosBR false class
-        df_boatosbr_false = df_boatosbr_false.sample(
-            n=1516, random_state=42
-        ).reset_index(drop=True)
-
-        # Define datasets (bases) with increasing data amounts
-        data1 = pd.concat([df_fakebr_true, df_fakebr_false], ignore_index=True)
-        data2 = pd.concat(
-            [
-                df_fakebr_true,
-                df_fakebr_false,
-                df_fake_recogna_true,
-                df_fake_recogna_false,
-            ],
-            ignore_index=True,
-        )
-        data3 = pd.concat(
-            [
-                df_fakebr_true,
-                df_fakebr_false,
-                df_fake_recogna_true,
-                df_fake_recogna_false,
-                df_faketrue_true,
-                df_faketrue_false,
-            ],
-            ignore_index=True,
-        )
-        data4 = pd.concat(
-            [
-                df_fakebr_true,
-                df_fakebr_false,
-                df_fake_recogna_true,
-                df_fake_recogna_false,
-                df_faketrue_true,
-                df_faketrue_false,
-                df_boatosbr_true,
-                df_boatosbr_false,
-            ],
-            ignore_index=True,
-        )
-
-        logging.info("Starting processing for BoW representation method")
-        results_bow = {f"Base {i}": {} for i in range(1, 5)}
-        for i, data in enumerate([data1, data2, data3, data4], start=1):
-            res = run_classification_methods("BOW", data)
-            fill_results(f"Base {i}", res, "BOW", results_bow)
+    feature_selection = {}
+    if args.feature_selection:
+        feature_selection = load_json(args.feature_selection)
+        for config in feature_selection.values():
+            validate_config(config)
 
-        # Save results to JSON
-        results_dir = Path("results")
-        results_dir.mkdir(exist_ok=True)
-        results_path = results_dir / "results_bow.json"
-        with open(results_path, "w", encoding="utf-8") as f:
-            json.dump(results_bow, f, indent=4, ensure_ascii=False)
-        logging.info(f"Results saved to: {results_path}")
+    if args.mode == "predict":
+        run_predict(args)
+        return
 
-        logging.info("Starting processing for TF-IDF representation method")
-        results_tfidf = {f"Base {i}": {} for i in range(1, 5)}
-        for i, data in enumerate([data1, data2, data3, data4], start=1):
-            res = run_classification_methods("TFIDF", data)
-            fill_results(f"Base {i}", res, "TFIDF", results_tfidf)
+    if args.mode == "update":
+        run_update(args)
+        return
 
-        results_path = results_dir / "results_tfidf.json"
-        with open(results_path, "w", encoding="utf-8") as f:
-            json.dump(results_tfidf, f, indent=4, ensure_ascii=False)
-        logging.info(f"Results saved to: {results_path}")
+    if args.mode == "tune":
+        run_tuning(
+            args, load_bases(args.dedup, args.dedup_threshold), feature_selection
+        )
+        return
 
-        logging.info("Starting processing for Word2Vec representation method")
-        results_word2vec = {f"Base {i}": {} for i in range(1, 5)}
-        for i, data in enumerate([data1, data2, data3, data4], start=1):
-            res = run_classification_methods("function_Word2Vec", data)
-            fill_results(f"Base {i}", res, "Word2Vec", results_word2vec)
+    if args.mode == "scaling":
+        run_scaling(
+            args, load_bases(args.dedup, args.dedup_threshold), feature_selection
+        )
+        return
 
-        results_path = results_dir / "results_word2vec.json"
-        with open(results_path, "w", encoding="utf-8") as f:
-            json.dump(results_word2vec, f, indent=4, ensure_ascii=False)
-        logging.info(f"Results saved to: {results_path}")
+    if args.mode == "full":
+        bases = load_bases(
+            args.dedup, args.dedup_threshold, cache_bases=args.save_artifacts
+        )
+        results = run_full(args, bases, feature_selection)
+        results_bow = results["BOW"]
+        results_tfidf = results["TFIDF"]
+        results_word2vec = results["Word2Vec"]
 
     else:
         logging.info("Generating plots from existing JSON files...")
@@ -0,0 +1,129 @@
+import time
+
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_selection import SelectKBest, chi2
+from sklearn.preprocessing import MinMaxScaler
+
+VALID_KEYS = {"min_df", "max_df", "chi2_k", "svd_components"}
+
+
+def matrix_nbytes(matrix):
+    """
+    Returns the memory used by a dense or sparse feature matrix, in bytes.
+    """
+    if sparse.issparse(matrix):
+        return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    return np.asarray(matrix).nbytes
+
+
+def _document_frequency(matrix):
+    """
+    Counts, for each column, in how many rows the feature is non-zero.
+    """
+    if sparse.issparse(matrix):
+        return sparse.csc_matrix(matrix).getnnz(axis=0)
+    return np.count_nonzero(matrix, axis=0)
+
+
+def _df_threshold(value, n_docs):
+    """
+    Converts a min_df/max_df setting into an absolute document count.
+
+    Integers are absolute counts and floats are proportions, as in CountVectorizer.
+    """
+    if isinstance(value, float):
+        return value * n_docs
+    return value
+
+
+def validate_config(config):
+    """
+    Checks a feature selection configuration and raises ValueError on unknown keys.
+    """
+    unknown = set(config) - VALID_KEYS
+    if unknown:
+        raise ValueError(
+            f"Unknown feature selection options: {unknown}. Valid options: {VALID_KEYS}"
+        )
+
+
+def select_features(x_train, x_test, y_train, config):
+    """
+    Applies the configured pruning, selection and reduction steps to a feature matrix.
+
+    Every step is fitted on the training split only and then applied to the test split.
+
+    Args:
+        x_train: Training feature matrix (dense or sparse).
+        x_test: Test feature matrix (dense or sparse).
+        y_train: Training labels.
+        config (dict): Any of 'min_df', 'max_df' (document frequency pruning,
+            only meaningful for sparse BoW/TF-IDF counts), 'chi2_k' (keep the k
+            best features by chi²) and 'svd_components' (TruncatedSVD output dimension).
+
+    Returns:
+        tuple: (reduced x_train, reduced x_test, report dict, fitted steps list)
+    """
+    validate_config(config)
+    start = time.perf_counter()
+    steps = []
+
+    report = {
+        "config": dict(config),
+        "n_features_before": x_train.shape[1],
+        "memory_mb_before": matrix_nbytes(x_train) / 1024**2,
+    }
+
+    if "min_df" in config or "max_df" in config:
+        n_docs = x_train.shape[0]
+        doc_freq = _document_frequency(x_train)
+        min_df = _df_threshold(config.get("min_df", 1), n_docs)
+        max_df = _df_threshold(config.get("max_df", 1.0), n_docs)
+        keep = np.flatnonzero((doc_freq >= min_df) & (doc_freq <= max_df))
+        if keep.size == 0:
+            raise ValueError(
+                f"min_df/max_df pruning removed every feature (config: {config})"
+            )
+        x_train = x_train[:, keep]
+        x_test = x_test[:, keep]
+        steps.append(("columns", keep))
+
+    if "chi2_k" in config:
+        k = min(config["chi2_k"], x_train.shape[1])
+        selector = SelectKBest(chi2, k=k)
+        x_train = selector.fit_transform(x_train, y_train)
+        x_test = selector.transform(x_test)
+        steps.append(("transformer", selector))
+
+    if "svd_components" in config:
+        n_components = min(config["svd_components"], x_train.shape[1] - 1)
+        svd = TruncatedSVD(n_components=n_components, random_state=42)
+        x_train = svd.fit_transform(x_train)
+        x_test = svd.transform(x_test)
+        steps.append(("transformer", svd))
+
+        # SVD components can be negative; rescale so MultinomialNB still applies
+        scaler = MinMaxScaler()
+        x_train = scaler.fit_transform(x_train)
+        x_test = scaler.transform(x_test)
+        steps.append(("transformer", scaler))
+
+    report["n_features_after"] = x_train.shape[1]
+    report["memory_mb_after"] = matrix_nbytes(x_train) / 1024**2
+    report["selection_time"] = time.perf_counter() - start
+
+    return x_train, x_test, report, steps
+
+
+def apply_selected_features(steps, matrix):
+    """
+    Applies fitted steps returned by select_features to a new feature matrix.
+    """
+    for kind, step in steps:
+        if kind == "columns":
+            matrix = matrix[:, step]
+        else:
+            matrix = step.transform(matrix)
+    return matrix
@@ -0,0 +1,120 @@
+import logging
+import time
+
+from classification_method import compute_metrics
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import HalvingGridSearchCV, StratifiedGroupKFold
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import SVC
+from utils import prepare_features
+
+# Base estimator and parameter grid per classifier. RandomForest builds its trees
+# sequentially so that the parallelism goes to the candidates instead.
+SEARCH_SPACES = {
+    "SVC": (SVC(kernel="linear"), {"C": [0.01, 0.1, 1.0, 10.0]}),
+    "LogisticRegression": (
+        LogisticRegression(max_iter=500),
+        {"C": [0.01, 0.1, 1.0, 10.0, 100.0]},
+    ),
+    "MultinomialNB": (MultinomialNB(), {"alpha": [0.01, 0.05, 0.1, 0.5, 1.0, 2.0]}),
+    "RandomForest": (
+        RandomForestClassifier(random_state=42, n_jobs=1),
+        {
+            "n_estimators": [100, 300],
+            "max_depth": [None, 30],
+            "max_features": ["sqrt", "log2"],
+        },
+    ),
+}
+
+
+def halving_search(
+    estimator, param_grid, x_train, y_train, factor=3, cv=3, n_jobs=-1, groups=None
+):
+    """
+    Runs a successive halving grid search over the training split.
+
+    Every candidate starts on a small subsample; only the best 1/factor of them
+    move on to the next iteration, which uses factor times more samples.
+    When groups are given (near-duplicate clusters), each group stays within
+    a single cross-validation fold.
+    """
+    if groups is not None:
+        cv = StratifiedGroupKFold(n_splits=cv, shuffle=True, random_state=42)
+
+    search = HalvingGridSearchCV(
+        estimator,
+        param_grid,
+        factor=factor,
+        resource="n_samples",
+        min_resources="exhaust",
+        cv=cv,
+        scoring="f1_weighted",
+        n_jobs=n_jobs,
+        random_state=42,
+    )
+
+    start = time.perf_counter()
+    search.fit(x_train, y_train, groups=groups)
+    search_time = time.perf_counter() - start
+
+    return search, search_time
+
+
+def tune_classifiers(
+    representation, dataframe, feature_selection=None, dtype=None, factor=3, n_jobs=-1
+):
+    """
+    Tunes every classifier on one representation with successive halving.
+
+    The representation is built and split once and then shared by all searches.
+    The best configuration of each classifier is evaluated on the test split.
+    When the dataframe has a 'DupGroup' column, the cross-validation folds keep
+    near-duplicates together, like the train/test split does.
+
+    Returns:
+        dict: classifier name -> best parameters, scores, timings and test metrics
+    """
+    features = prepare_features(representation, dataframe, feature_selection, dtype)
+    x_train, x_test = features["x_train"], features["x_test"]
+    y_train, y_test = features["y_train"], features["y_test"]
+    groups = None
+    if "DupGroup" in dataframe:
+        groups = dataframe["DupGroup"].to_numpy()[features["train_index"]]
+
+    results = {}
+    for clf_name, (estimator, param_grid) in SEARCH_SPACES.items():
+        logging.info(f"Tuning {clf_name} on {representation}")
+        search, search_time = halving_search(
+            estimator,
+            param_grid,
+            x_train,
+            y_train,
+            factor=factor,
+            n_jobs=n_jobs,
+            groups=groups,
+        )
+
+        start = time.perf_counter()
+        y_pred = search.best_estimator_.predict(x_test)
+        predict_time = time.perf_counter() - start
+
+        results[clf_name] = {
+            "model": str(search.best_estimator_),
+            "best_params": search.best_params_,
+            "best_cv_f1_score": search.best_score_,
+            **compute_metrics(y_test, y_pred),
+            "search_time": search_time,
+            "refit_time": search.refit_time_,
+            "predict_time": predict_time,
+            "n_candidates": [int(n) for n in search.n_candidates_],
+            "n_resources": [int(n) for n in search.n_resources_],
+        }
+        logging.info(
+            f"Best {clf_name} on {representation}: {search.best_params_} "
+            f"(cv f1 {search.best_score_:.4f}, {search_time:.1f}s)"
+        )
+
+    return results
@@ -0,0 +1,568 @@
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from artifacts import (
+    list_bundles,
+    load_representation_state,
+    read_representation_manifest,
+    save_model,
+    save_representation,
+)
+from classification_method import compute_metrics
+from deduplication import match_new_texts
+from nltk.tokenize import word_tokenize
+from representation_method import apply_idf, document_vectors, smooth_idf
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedGroupKFold, train_test_split
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.preprocessing import MinMaxScaler
+from utils import preprocess_text
+
+CORPUS_CACHE_DIR = Path("cache") / "corpus"
+
+
+def cached_base_path(base_number):
+    return CORPUS_CACHE_DIR / f"base_{base_number}.pkl"
+
+
+def added_articles_dir(base_number):
+    return CORPUS_CACHE_DIR / f"base_{base_number}_added"
+
+
+def save_cached_base(base_number, dataframe):
+    """
+    Stores a preprocessed base so later updates do not re-read the raw corpora.
+
+    Only the articles read from the corpora are stored here; articles added by
+    updates are kept apart (see append_added_articles).
+    """
+    path = cached_base_path(base_number)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dataframe.to_pickle(path)
+
+
+def append_added_articles(base_number, dataframe):
+    """
+    Appends a batch of updated articles to the base's append-only store.
+
+    Each batch is its own file, written under a temporary name and renamed, so
+    an interrupted write never leaves a partial batch behind.
+    """
+    batch_dir = added_articles_dir(base_number)
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    batch_number = len(list(batch_dir.glob("batch_*.pkl"))) + 1
+    path = batch_dir / f"batch_{batch_number:05d}.pkl"
+
+    tmp_path = path.with_suffix(".tmp")
+    dataframe[["FullText", "Classe"]].to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_added_articles(base_number):
+    """
+    Loads every article added to a base by updates, in the order they were added.
+    """
+    paths = sorted(added_articles_dir(base_number).glob("batch_*.pkl"))
+    if not paths:
+        return pd.DataFrame(
+            {"FullText": pd.Series(dtype=str), "Classe": pd.Series(dtype=int)}
+        )
+    return pd.concat([pd.read_pickle(path) for path in paths], ignore_index=True)
+
+
+def deduplicate_added_articles(dataframe, added, dedup="off", threshold=0.8):
+    """
+    Applies the near-duplicate handling of load_bases to articles added by
+    updates, matching each one against the base and the articles added before it.
+
+    Args:
+        dataframe (DataFrame): Base read from the corpora.
+        added (DataFrame): Added articles, in the order they were added.
+        dedup (str): 'off', 'report', 'drop' (added duplicates are removed) or
+            'group' (added duplicates join the group of the article they match).
+        threshold (float): Minimum estimated Jaccard similarity of the shingles.
+
+    Returns:
+        DataFrame: The added articles to keep, with their original index.
+    """
+    if dedup == "off" or added.empty:
+        if "DupGroup" in dataframe.columns:
+            first_group = dataframe["DupGroup"].max() + 1
+            added = added.assign(DupGroup=np.arange(len(added)) + first_group)
+        return added
+
+    matches = match_new_texts(
+        dataframe["FullText"].tolist(), added["FullText"].tolist(), threshold
+    )
+    is_copy = matches >= 0
+    logging.info(
+        f"{int(is_copy.sum())} of {len(added)} added articles are near-duplicates "
+        "of earlier articles"
+    )
+
+    if dedup == "drop":
+        return added[~is_copy]
+    if dedup == "report":
+        return added
+
+    base_groups = dataframe["DupGroup"].to_numpy()
+    groups = np.empty(len(added), dtype=base_groups.dtype)
+    next_group = base_groups.max() + 1
+    for i, match in enumerate(matches):
+        if match < 0:
+            groups[i] = next_group
+            next_group += 1
+        elif match < len(dataframe):
+            groups[i] = base_groups[match]
+        else:
+            groups[i] = groups[match - len(dataframe)]
+    return added.assign(DupGroup=groups)
+
+
+def merge_added_articles(base_number, dataframe, dedup="off", threshold=0.8):
+    """
+    Appends the articles added by updates to a base read from the corpora,
+    with the same near-duplicate handling (see deduplicate_added_articles).
+    """
+    added = load_added_articles(base_number)
+    if added.empty:
+        return dataframe
+
+    added = deduplicate_added_articles(dataframe, added, dedup, threshold)
+    logging.info(f"Adding {len(added)} updated articles to Base {base_number}")
+    return pd.concat([dataframe, added], ignore_index=True)
+
+
+def load_cached_snapshot(base_number):
+    """
+    Loads a preprocessed base stored by save_cached_base.
+    """
+    path = cached_base_path(base_number)
+    if not path.exists():
+        raise FileNotFoundError(
+            f"The cached corpus {path} does not exist. "
+            "Run with --mode full --save-artifacts first."
+        )
+    return pd.read_pickle(path)
+
+
+def load_cached_base(base_number, dedup="off", threshold=0.8):
+    """
+    Loads a preprocessed base stored by save_cached_base, with the articles
+    added by earlier updates appended.
+    """
+    return merge_added_articles(
+        base_number, load_cached_snapshot(base_number), dedup, threshold
+    )
+
+
+def read_new_articles(file_path_str):
+    """
+    Reads newly labeled articles from a CSV file with 'FullText' and 'Classe'
+    columns and preprocesses the texts like the corpus readers do.
+    """
+    path = Path(file_path_str)
+    if not path.exists():
+        raise FileNotFoundError(f"The file {path} does not exist.")
+
+    df_new = pd.read_csv(path)
+    expected_columns = {"FullText", "Classe"}
+    if not expected_columns.issubset(df_new.columns):
+        raise ValueError(
+            f"Expected columns missing in file. Expected: {expected_columns}, Found: {set(df_new.columns)}"
+        )
+
+    df_new = df_new[["FullText", "Classe"]].dropna()
+    df_new["FullText"] = df_new["FullText"].astype(str).apply(preprocess_text)
+    df_new["Classe"] = df_new["Classe"].astype(int)
+
+    if df_new.empty:
+        raise ValueError(f"No labeled articles found in {path}.")
+
+    return df_new.reset_index(drop=True)
+
+
+def split_new_documents(labels, offset, groups=None, train_groups=(), test_groups=()):
+    """
+    Splits the new documents 80/20 like the original split, keeping the
+    existing partition untouched. Row indices are shifted by offset.
+
+    With groups (near-duplicate clusters), new documents of a group already in
+    the base join that group's side of the split (train_groups or test_groups),
+    and new groups are split as a whole.
+    """
+    indices = np.arange(len(labels)) + offset
+    if groups is None:
+        if len(labels) < 5:
+            return indices, np.array([], dtype=int)
+
+        _, class_counts = np.unique(labels, return_counts=True)
+        stratify = labels if class_counts.min() >= 2 else None
+        return train_test_split(
+            indices, test_size=0.2, random_state=52, stratify=stratify
+        )
+
+    in_train = np.isin(groups, train_groups)
+    known = in_train | np.isin(groups, test_groups)
+    train = [indices[known & in_train]]
+    test = [indices[known & ~in_train]]
+
+    fresh = ~known
+    if len(np.unique(groups[fresh])) >= 5:
+        splitter = StratifiedGroupKFold(n_splits=5, shuffle=True, random_state=52)
+        fresh_train, fresh_test = next(
+            splitter.split(np.zeros(fresh.sum()), labels[fresh], groups[fresh])
+        )
+        train.append(indices[fresh][fresh_train])
+        test.append(indices[fresh][fresh_test])
+    else:
+        train.append(indices[fresh])
+
+    return np.concatenate(train), np.concatenate(test)
+
+
+def update_count_representation(state, new_texts, dtype, with_idf):
+    """
+    Extends a BoW/TF-IDF representation with new documents.
+
+    Unseen terms are appended to the end of the vocabulary, so the columns of
+    existing documents do not move. Document frequencies and idf weights are
+    updated from the new counts only.
+
+    Returns:
+        tuple: (feature matrix for old and new documents, updated state)
+    """
+    vocabulary = dict(state["vocabulary"])
+    n_old_features = len(vocabulary)
+
+    new_terms = CountVectorizer().fit(new_texts).vocabulary_
+    for term in sorted(new_terms):
+        if term not in vocabulary:
+            vocabulary[term] = len(vocabulary)
+
+    new_counts = CountVectorizer(vocabulary=vocabulary, dtype=dtype).transform(
+        new_texts
+    )
+    old_counts = state["counts"]
+    old_counts.resize((old_counts.shape[0], len(vocabulary)))
+    counts = sparse.vstack([old_counts, new_counts.astype(old_counts.dtype)]).tocsr()
+
+    document_frequency = np.zeros(len(vocabulary), dtype=np.int64)
+    document_frequency[:n_old_features] = state["document_frequency"]
+    document_frequency += np.bincount(new_counts.indices, minlength=len(vocabulary))
+
+    new_state = {
+        "vocabulary": vocabulary,
+        "document_frequency": document_frequency,
+        "n_documents": counts.shape[0],
+        "counts": counts,
+    }
+    logging.info(
+        f"Vocabulary grew from {n_old_features} to {len(vocabulary)} terms "
+        f"with {len(new_texts)} new documents"
+    )
+
+    if not with_idf:
+        return counts, new_state
+
+    new_state["idf"] = smooth_idf(document_frequency, counts.shape[0])
+    return apply_idf(counts, new_state["idf"], dtype=dtype), new_state
+
+
+def update_word2vec_representation(state, old_texts, new_texts, dtype):
+    """
+    Continues training the Word2Vec model on the new documents only, then
+    recomputes and rescales the document vectors of the whole base.
+
+    Returns:
+        tuple: (feature matrix for old and new documents, updated state)
+    """
+    w2v_model = state["w2v_model"]
+    new_tokens = [word_tokenize(str(text).lower()) for text in new_texts]
+
+    w2v_model.build_vocab(new_tokens, update=True)
+    w2v_model.train(new_tokens, total_examples=len(new_tokens), epochs=w2v_model.epochs)
+
+    old_tokens = [word_tokenize(str(text).lower()) for text in old_texts]
+    doc_vectors = document_vectors(w2v_model.wv, old_tokens + new_tokens, dtype=dtype)
+
+    scaler = MinMaxScaler()
+    features = scaler.fit_transform(doc_vectors)
+
+    return features, {"w2v_model": w2v_model, "scaler": scaler}
+
+
+def _pad_columns(array, n_columns):
+    """
+    Appends zero columns to a 2D array so it has n_columns columns.
+    """
+    padded = np.zeros((array.shape[0], n_columns), dtype=array.dtype)
+    padded[:, : array.shape[1]] = array
+    return padded
+
+
+def update_classifier(
+    model, x_train, y_train, x_new_train, y_new_train, old_rows_unchanged
+):
+    """
+    Updates a trained classifier with the extended training set.
+
+    - MultinomialNB is updated with partial_fit on the new rows only, when the
+      features of the existing documents did not change (BoW counts).
+    - LogisticRegression is warm-started from its previous coefficients.
+    - Other classifiers (SVC, RandomForest, HistGradientBoosting) cannot
+      continue training on a grown feature space and are refit.
+
+    Returns:
+        tuple: (updated model, strategy name)
+    """
+    n_features = x_train.shape[1]
+
+    if isinstance(model, MultinomialNB) and old_rows_unchanged:
+        model.feature_count_ = _pad_columns(model.feature_count_, n_features)
+        model.n_features_in_ = n_features
+        model.partial_fit(x_new_train, y_new_train)
+        return model, "partial_fit"
+
+    if isinstance(model, LogisticRegression):
+        model.coef_ = _pad_columns(model.coef_, n_features)
+        model.warm_start = True
+        model.fit(x_train, y_train)
+        return model, "warm_start"
+
+    model = clone(model)
+    model.fit(x_train, y_train)
+    return model, "refit"
+
+
+def check_artifact_dir(artifact_dir, n_documents):
+    """
+    Checks that a saved (base, representation) can be updated incrementally
+    from a cached base of n_documents articles.
+
+    Raises:
+        ValueError: If the artifact cannot be updated.
+    """
+    manifest = read_representation_manifest(artifact_dir)
+    files = manifest["files"]
+
+    if "feature_selection" in files:
+        raise ValueError(
+            f"{artifact_dir} was trained with feature selection, which cannot be "
+            "updated incrementally. Run with --mode full instead."
+        )
+    if manifest.get("n_documents") != n_documents or "train_index" not in files:
+        raise ValueError(
+            f"{artifact_dir} does not match the cached corpus. Run with --mode full --save-artifacts first."
+        )
+
+
+def update_representation(artifact_dir, old_df, new_df):
+    """
+    Updates one saved (base, representation) and all of its classifier bundles
+    with new labeled documents, then saves them in place.
+
+    Returns:
+        dict: classifier name -> update strategy, timings and test metrics
+    """
+    check_artifact_dir(artifact_dir, len(old_df))
+    manifest, state = load_representation_state(artifact_dir)
+    method_name = manifest["representation"]
+    dtype = np.dtype(manifest["dtype"])
+
+    start = time.perf_counter()
+    new_texts = new_df["FullText"].astype(str).tolist()
+    if "vocabulary" in state:
+        features, new_state = update_count_representation(
+            state, new_texts, dtype, with_idf="idf" in state
+        )
+        old_rows_unchanged = "idf" not in state
+    else:
+        features, new_state = update_word2vec_representation(
+            state, old_df["FullText"].tolist(), new_texts, dtype
+        )
+        old_rows_unchanged = False
+    representation_time = time.perf_counter() - start
+
+    labels = np.concatenate([old_df["Classe"].to_numpy(), new_df["Classe"].to_numpy()])
+    split_groups = {}
+    if "DupGroup" in old_df.columns and "DupGroup" in new_df.columns:
+        old_groups = old_df["DupGroup"].to_numpy()
+        split_groups = {
+            "groups": new_df["DupGroup"].to_numpy(),
+            "train_groups": old_groups[state["train_index"]],
+            "test_groups": old_groups[state["test_index"]],
+        }
+    new_train_index, new_test_index = split_new_documents(
+        new_df["Classe"].to_numpy(), offset=len(old_df), **split_groups
+    )
+    train_index = np.concatenate([state["train_index"], new_train_index])
+    test_index = np.concatenate([state["test_index"], new_test_index])
+
+    x_train, y_train = features[train_index], labels[train_index]
+    x_test, y_test = features[test_index], labels[test_index]
+
+    results = {}
+    for bundle_dir in list_bundles(artifact_dir):
+        model = joblib.load(bundle_dir / "model.joblib")
+
+        start = time.perf_counter()
+        model, strategy = update_classifier(
+            model,
+            x_train,
+            y_train,
+            features[new_train_index],
+            labels[new_train_index],
+            old_rows_unchanged,
+        )
+        update_time = time.perf_counter() - start
+
+        result_data = {"model": model, **compute_metrics(y_test, model.predict(x_test))}
+        save_model(artifact_dir, bundle_dir.name, result_data)
+
+        results[bundle_dir.name] = {
+            "update_strategy": strategy,
+            "update_time": update_time,
+            "representation_update_time": representation_time,
+            **{key: value for key, value in result_data.items() if key != "model"},
+        }
+        logging.info(
+            f"Updated {method_name} {bundle_dir.name} with {strategy} in {update_time:.2f}s "
+            f"(f1 {result_data['f1_score']:.4f})"
+        )
+
+    save_representation(
+        artifact_dir,
+        method_name,
+        dtype,
+        new_state,
+        split=(train_index, test_index),
+        n_documents=len(labels),
+    )
+
+    return results
+
+
+def _swap_directories(staged_dirs, commit):
+    """
+    Replaces each artifact directory with its updated copy, then runs commit.
+
+    If any step fails, the original directories are put back, so the artifacts
+    and the cached corpus stay in sync.
+    """
+    swapped = []
+    try:
+        for artifact_dir, staging_dir in staged_dirs.items():
+            backup_dir = artifact_dir.with_name(f"{artifact_dir.name}.previous")
+            shutil.rmtree(backup_dir, ignore_errors=True)
+            artifact_dir.rename(backup_dir)
+            swapped.append((artifact_dir, backup_dir))
+            staging_dir.rename(artifact_dir)
+        commit()
+    except BaseException:
+        for artifact_dir, backup_dir in reversed(swapped):
+            shutil.rmtree(artifact_dir, ignore_errors=True)
+            backup_dir.rename(artifact_dir)
+        raise
+
+    for _, backup_dir in swapped:
+        shutil.rmtree(backup_dir)
+
+
+def update_base(base_number, new_df, artifacts_root, dedup="off", dedup_threshold=0.8):
+    """
+    Appends new labeled documents to a cached base and updates every saved
+    representation and classifier of that base.
+
+    The new documents get the same near-duplicate handling as load_bases (dedup
+    should match the mode the artifacts were trained with): duplicates of
+    earlier articles are dropped, or join their group's side of the split.
+
+    Every representation is checked before any is touched; those trained with
+    feature selection are skipped. The updates are written to copies of the
+    artifact directories, which replace the originals together with the new
+    batch of the cached corpus only once all of them succeed.
+
+    Returns:
+        dict: representation key -> classifier results
+    """
+    snapshot = load_cached_snapshot(base_number)
+    added = load_added_articles(base_number)
+    # Matches only look backwards, so the earlier added articles keep the
+    # handling they had when the artifacts were updated with them
+    all_added = deduplicate_added_articles(
+        snapshot,
+        pd.concat([added, new_df[["FullText", "Classe"]]], ignore_index=True),
+        dedup,
+        dedup_threshold,
+    )
+    old_df = pd.concat(
+        [snapshot, all_added[all_added.index < len(added)]], ignore_index=True
+    )
+    checked_new_df = all_added[all_added.index >= len(added)].reset_index(drop=True)
+    if checked_new_df.empty:
+        raise ValueError(
+            "All new articles are near-duplicates of articles already in the base."
+        )
+    base_dir = Path(artifacts_root) / f"Base_{base_number}"
+    artifact_dirs = []
+    if base_dir.exists():
+        artifact_dirs = sorted(
+            path
+            for path in base_dir.iterdir()
+            if path.is_dir() and "." not in path.name
+        )
+    if not artifact_dirs:
+        raise FileNotFoundError(
+            f"No artifacts found in {base_dir}. Run with --mode full --save-artifacts first."
+        )
+
+    checked_dirs = []
+    for artifact_dir in artifact_dirs:
+        if "feature_selection" in read_representation_manifest(artifact_dir)["files"]:
+            logging.warning(
+                f"Skipping {artifact_dir}: feature selection cannot be updated "
+                "incrementally. Run with --mode full to retrain it."
+            )
+            continue
+        check_artifact_dir(artifact_dir, len(old_df))
+        checked_dirs.append(artifact_dir)
+    artifact_dirs = checked_dirs
+    if not artifact_dirs:
+        raise ValueError(
+            f"No artifacts in {base_dir} can be updated. Run with --mode full --save-artifacts first."
+        )
+
+    results = {}
+    staged_dirs = {}
+    try:
+        for artifact_dir in artifact_dirs:
+            staging_dir = artifact_dir.with_name(f"{artifact_dir.name}.updating")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            shutil.copytree(artifact_dir, staging_dir)
+            staged_dirs[artifact_dir] = staging_dir
+
+            logging.info(
+                f"Updating {artifact_dir} with {len(checked_new_df)} new documents"
+            )
+            results[artifact_dir.name] = update_representation(
+                staging_dir, old_df, checked_new_df
+            )
+
+        _swap_directories(
+            staged_dirs, lambda: append_added_articles(base_number, new_df)
+        )
+    finally:
+        for staging_dir in staged_dirs.values():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    return results
@@ -0,0 +1,176 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.svm import SVC
+
+DEFAULT_BATCH_SIZE = 4096
+
+
+def score_method(model):
+    """
+    Returns the name of the model's continuous score method: predict_proba when
+    available, otherwise decision_function (e.g. SVC trained without probabilities).
+    """
+    if hasattr(model, "predict_proba"):
+        return "predict_proba"
+    if hasattr(model, "decision_function"):
+        return "decision_function"
+    raise ValueError(
+        f"{type(model).__name__} exposes neither predict_proba nor decision_function"
+    )
+
+
+def predicts_in_parallel(model):
+    """
+    Tells whether the model already spreads predict over several cores, either
+    through n_jobs (RandomForest) or OpenMP (HistGradientBoosting).
+    """
+    if getattr(model, "n_jobs", None) not in (None, 1):
+        return True
+    return isinstance(model, HistGradientBoostingClassifier)
+
+
+def outer_n_jobs(model, n_jobs=None):
+    """
+    Returns the number of chunk threads to use for the model's predictions.
+
+    Models that already predict in parallel get sequential chunks, so their
+    thread pools are not started once per chunk thread.
+    """
+    if predicts_in_parallel(model):
+        return 1
+    return n_jobs
+
+
+def labels_from_scores(model, scores):
+    """
+    Derives the predicted labels from predict_proba or decision_function output,
+    as model.predict would: the class with the highest score, or the positive
+    class when a binary decision score is above zero.
+    """
+    if scores.ndim == 2:
+        return model.classes_[np.argmax(scores, axis=1)]
+    return model.classes_[(scores > 0).astype(int)]
+
+
+def map_batched(chunk_func, data, batch_size=DEFAULT_BATCH_SIZE, n_jobs=None):
+    """
+    Applies chunk_func to row chunks of data, spread over threads.
+
+    Each worker slices its own chunk and writes the results straight into
+    preallocated outputs, so at most n_jobs chunks are materialized at a time
+    and peak memory does not grow with the number of rows.
+
+    Args:
+        chunk_func (callable): Maps a chunk of rows to a tuple of arrays with one
+            entry (or row) per input row.
+        data: CSR/dense matrix or list of texts.
+        batch_size (int): Rows per chunk.
+        n_jobs (int): Worker threads (defaults to the number of CPUs).
+
+    Returns:
+        tuple: One array per output of chunk_func, covering all rows.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+
+    if sparse.issparse(data):
+        data = data.tocsr()
+    n_rows = data.shape[0] if hasattr(data, "shape") else len(data)
+    if n_rows == 0:
+        raise ValueError("Cannot predict on an empty input (0 rows)")
+
+    def run_chunk(start):
+        return chunk_func(data[start : start + batch_size])
+
+    # The first chunk tells the output shapes and dtypes
+    first = tuple(np.asarray(result) for result in run_chunk(0))
+    if n_rows <= batch_size:
+        return first
+
+    outputs = tuple(
+        np.empty((n_rows,) + result.shape[1:], dtype=result.dtype) for result in first
+    )
+    for output, result in zip(outputs, first):
+        output[: result.shape[0]] = result
+
+    def fill_chunk(start):
+        for output, result in zip(outputs, run_chunk(start)):
+            output[start : start + batch_size] = result
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        # list() re-raises any worker exception
+        list(executor.map(fill_chunk, range(batch_size, n_rows, batch_size)))
+
+    return outputs
+
+
+def predict_batched(
+    model,
+    data,
+    method="predict",
+    batch_size=DEFAULT_BATCH_SIZE,
+    n_jobs=None,
+    transform=None,
+):
+    """
+    Runs model.predict (or predict_proba / decision_function) in row chunks.
+
+    Args:
+        model: Fitted estimator.
+        data: CSR/dense feature matrix, or a list of texts when transform is given.
+        method (str): 'predict', 'predict_proba' or 'decision_function'.
+        batch_size (int): Rows per chunk.
+        n_jobs (int): Worker threads (defaults to the number of CPUs). Models that
+            already predict in parallel always use one.
+        transform (callable): Optional function mapping a chunk of data to features.
+
+    Returns:
+        np.ndarray: Outputs for all rows, in input order.
+    """
+    if not hasattr(model, method):
+        raise ValueError(f"{type(model).__name__} does not support {method}")
+    func = getattr(model, method)
+
+    def chunk_func(chunk):
+        if transform is not None:
+            chunk = transform(chunk)
+        return (func(chunk),)
+
+    return map_batched(chunk_func, data, batch_size, outer_n_jobs(model, n_jobs))[0]
+
+
+def predict_with_scores(
+    model, data, batch_size=DEFAULT_BATCH_SIZE, n_jobs=None, transform=None
+):
+    """
+    Predicts labels and continuous scores in batches.
+
+    Each chunk is transformed and scored once; the labels are derived from the
+    scores instead of running the model a second time (except for multiclass SVC).
+
+    Returns:
+        tuple: (labels, scores, name of the score method)
+    """
+    method = score_method(model)
+    score_func = getattr(model, method)
+    # Multiclass SVC predicts by one-vs-one votes, which its one-vs-rest
+    # decision scores do not always reproduce
+    separate_labels = isinstance(model, SVC) and len(model.classes_) > 2
+
+    def chunk_func(chunk):
+        if transform is not None:
+            chunk = transform(chunk)
+        scores = score_func(chunk)
+        if separate_labels:
+            return model.predict(chunk), scores
+        return labels_from_scores(model, scores), scores
+
+    labels, scores = map_batched(
+        chunk_func, data, batch_size, outer_n_jobs(model, n_jobs)
+    )
+    return labels, scores, method
@@ -2,59 +2,121 @@ import numpy as np
 from gensim.models import Word2Vec
 from nltk.tokenize import word_tokenize
 from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
-from sklearn.preprocessing import MinMaxScaler
+from sklearn.preprocessing import MinMaxScaler, normalize
 
 
-def bow_representation(news_df):
+def count_state(vectorizer, count_matrix):
+    """
+    Collects the fitted count statistics needed to reuse or extend a representation.
+
+    Args:
+        vectorizer (CountVectorizer): Fitted vectorizer.
+        count_matrix (sparse matrix): Raw term counts, one row per document.
+
+    Returns:
+        dict: vocabulary, per-term document frequency, document count and counts
+    """
+    count_matrix = count_matrix.tocsr()
+    return {
+        "vocabulary": vectorizer.vocabulary_,
+        "document_frequency": np.bincount(
+            count_matrix.indices, minlength=count_matrix.shape[1]
+        ),
+        "n_documents": count_matrix.shape[0],
+        "counts": count_matrix,
+    }
+
+
+def smooth_idf(document_frequency, n_documents):
+    """
+    Computes idf weights the same way as TfidfTransformer(smooth_idf=True).
+    """
+    return np.log((1 + n_documents) / (1 + document_frequency)) + 1
+
+
+def apply_idf(count_matrix, idf, dtype=np.float64):
+    """
+    Weights a count matrix by idf and L2-normalizes each row, like TfidfTransformer.
+    """
+    matrix = count_matrix.astype(dtype)
+    matrix.data *= np.asarray(idf, dtype=dtype)[matrix.indices]
+    return normalize(matrix, norm="l2", copy=False)
+
+
+def document_vectors(wv, tokenized_texts, dtype=np.float64):
+    """
+    Averages the Word2Vec vectors of each document's known words.
+
+    Documents without any known word get a zero vector.
+    """
+    vector_size = wv.vector_size
+
+    def document_vector(doc):
+        vectors = [wv[word] for word in doc if word in wv]
+        if vectors:
+            return np.mean(vectors, axis=0, dtype=dtype)
+        else:
+            return np.zeros(vector_size, dtype=dtype)
+
+    return np.array([document_vector(doc) for doc in tokenized_texts], dtype=dtype)
+
+
+def bow_representation(news_df, dtype=np.int64):
     """
     Create Bag-of-Words representation from news dataframe.
 
     Args:
         news_df (pd.DataFrame): DataFrame with columns 'FullText' and 'Classe'
+        dtype: dtype of the count matrix (counts are exact in float32)
 
     Returns:
-        tuple: (sparse matrix of BOW features, list of labels)
+        tuple: (sparse matrix of BOW features, list of labels, fitted state dict)
     """
     texts = news_df["FullText"]
     labels = news_df["Classe"]
 
-    vectorizer = CountVectorizer()
+    vectorizer = CountVectorizer(dtype=dtype)
     bow_matrix = vectorizer.fit_transform(texts)
 
-    return bow_matrix, labels
+    return bow_matrix, labels, count_state(vectorizer, bow_matrix)
 
 
-def tfidf_representation(news_df):
+def tfidf_representation(news_df, dtype=np.float64):
     """
     Create TF-IDF representation from news dataframe.
 
     Args:
         news_df (pd.DataFrame): DataFrame with columns 'FullText' and 'Classe'
+        dtype: float dtype of the TF-IDF matrix (TfidfTransformer keeps float32 input)
 
     Returns:
-        tuple: (TF-IDF feature matrix, list of labels)
+        tuple: (TF-IDF feature matrix, list of labels, fitted state dict)
     """
     texts = news_df["FullText"].astype(str).tolist()
     labels = news_df["Classe"].tolist()
 
-    vectorizer = CountVectorizer()
+    vectorizer = CountVectorizer(dtype=dtype)
     count_matrix = vectorizer.fit_transform(texts)
 
     transformer = TfidfTransformer()
     tfidf_matrix = transformer.fit_transform(count_matrix)
 
-    return tfidf_matrix, labels
+    state = count_state(vectorizer, count_matrix)
+    state["idf"] = transformer.idf_
 
+    return tfidf_matrix, labels, state
 
-def word2vec_representation(news_df):
+
+def word2vec_representation(news_df, dtype=np.float64):
     """
     Create Word2Vec document embeddings for news dataframe.
 
     Args:
         news_df (pd.DataFrame): DataFrame with columns 'FullText' and 'Classe'
+        dtype: float dtype of the document vectors (MinMaxScaler keeps float32)
 
     Returns:
-        tuple: (normalized document vectors, list of labels)
+        tuple: (normalized document vectors, list of labels, fitted state dict)
     """
     vector_size = 300
     window = 10
@@ -73,14 +135,7 @@ def word2vec_representation(news_df):
         workers=4,
     )
 
-    def document_vector(doc):
-        vectors = [w2v_model.wv[word] for word in doc if word in w2v_model.wv]
-        if vectors:
-            return np.mean(vectors, axis=0)
-        else:
-            return np.zeros(vector_size)
-
-    doc_vectors = np.array([document_vector(doc) for doc in tokenized_texts])
+    doc_vectors = document_vectors(w2v_model.wv, tokenized_texts, dtype=dtype)
 
     # Normalize vectors between 0 and 1
     scaler = MinMaxScaler()
@@ -88,4 +143,4 @@ def word2vec_representation(news_df):
 
     labels = news_df["Classe"].tolist()
 
-    return doc_vectors_normalized, labels
+    return doc_vectors_normalized, labels, {"w2v_model": w2v_model, "scaler": scaler}
@@ -0,0 +1,149 @@
+import logging
+import time
+
+import numpy as np
+from classification_method import PeakRssTracker
+from scipy import sparse
+from utils import get_classifiers, prepare_features
+
+DEFAULT_FRACTIONS = [0.1, 0.25, 0.5, 1.0]
+
+
+def subsample(dataframe, fraction, random_state=42):
+    """
+    Draws a class-stratified fraction of a base.
+    """
+    if fraction >= 1.0:
+        return dataframe.copy()
+
+    return (
+        dataframe.groupby("Classe", group_keys=False)
+        .sample(frac=fraction, random_state=random_state)
+        .reset_index(drop=True)
+    )
+
+
+def measure_classifier(clf_func, x_train, y_train, x_test, y_test):
+    """
+    Runs a classifier function and records how much it raised the peak RSS, in MB.
+
+    RSS includes native allocations such as tree nodes and libsvm buffers. On
+    Linux the kernel high-water mark is read, so fit and predict run untraced
+    and their timings are not distorted.
+    """
+    with PeakRssTracker() as tracker:
+        result = clf_func(x_train, y_train, x_test, y_test)
+
+    result["peak_memory_mb"] = tracker.increase_mb
+    return result
+
+
+def fit_power_law(sizes, times):
+    """
+    Fits time = a * size^b by least squares in log-log space.
+
+    Returns:
+        tuple: (a, b), or None when fewer than two positive points are available.
+    """
+    points = [(n, t) for n, t in zip(sizes, times) if n > 0 and t is not None and t > 0]
+    if len(points) < 2:
+        return None
+
+    log_n, log_t = np.log([p[0] for p in points]), np.log([p[1] for p in points])
+    b, log_a = np.polyfit(log_n, log_t, 1)
+    return float(np.exp(log_a)), float(b)
+
+
+def summarize_curve(points, growth=10):
+    """
+    Fits complexity curves to the measured points of one classifier and
+    projects representation, fit and predict time and memory for a corpus
+    growth times larger.
+    """
+    sizes = [p["n_train"] for p in points]
+    n_documents = [p["n_documents"] for p in points]
+    summary = {"points": points}
+
+    for key, n_values in [
+        ("representation_time", n_documents),
+        ("representation_memory_mb", n_documents),
+        ("fit_time", sizes),
+        ("predict_time", [p["n_test"] for p in points]),
+        ("peak_memory_mb", sizes),
+    ]:
+        curve = fit_power_law(n_values, [p[key] for p in points])
+        if curve is None:
+            continue
+        a, b = curve
+        summary[f"{key}_exponent"] = b
+        summary[f"projected_{key}_{growth}x"] = a * (max(n_values) * growth) ** b
+
+    return summary
+
+
+def run_scaling_benchmark(
+    representation,
+    dataframe,
+    fractions=None,
+    feature_selection=None,
+    dtype=None,
+    memory_capped_rf=False,
+):
+    """
+    Measures how each classifier's cost grows with the amount of data.
+
+    The base is subsampled at each fraction; for every subsample the time and
+    memory spent rebuilding the representation are recorded, along with each
+    classifier's fit time, predict time, peak memory and metrics.
+
+    Returns:
+        dict: classifier name -> measured points, fitted exponents and projections
+    """
+    fractions = sorted(fractions or DEFAULT_FRACTIONS)
+    points = {}
+
+    for fraction in fractions:
+        data = subsample(dataframe, fraction)
+        with PeakRssTracker() as tracker:
+            start = time.perf_counter()
+            features = prepare_features(representation, data, feature_selection, dtype)
+            representation_time = time.perf_counter() - start
+        logging.info(
+            f"{representation} built at {fraction:.0%} in {representation_time:.2f}s, "
+            f"peak +{tracker.increase_mb or 0:.1f} MB"
+        )
+
+        x_train, x_test = features["x_train"], features["x_test"]
+        y_train, y_test = features["y_train"], features["y_test"]
+
+        classifiers = get_classifiers(
+            memory_capped_rf, dense=not sparse.issparse(x_train)
+        )
+        for clf_name, clf_func in classifiers.items():
+            result = measure_classifier(clf_func, x_train, y_train, x_test, y_test)
+            points.setdefault(clf_name, []).append(
+                {
+                    "fraction": fraction,
+                    "n_documents": len(data),
+                    "representation_time": representation_time,
+                    "representation_memory_mb": tracker.increase_mb,
+                    "n_train": x_train.shape[0],
+                    "n_test": x_test.shape[0],
+                    "n_features": x_train.shape[1],
+                    "fit_time": result["fit_time"],
+                    "predict_time": result["predict_time"],
+                    "peak_memory_mb": result["peak_memory_mb"],
+                    "accuracy": result["accuracy"],
+                    "precision": result["precision"],
+                    "recall": result["recall"],
+                    "f1_score": result["f1_score"],
+                }
+            )
+            logging.info(
+                f"{representation} {clf_name} at {fraction:.0%}: fit {result['fit_time']:.2f}s, "
+                f"predict {result['predict_time']:.2f}s, peak +{result['peak_memory_mb'] or 0:.1f} MB"
+            )
+
+    return {
+        clf_name: summarize_curve(clf_points) for clf_name, clf_points in points.items()
+    }
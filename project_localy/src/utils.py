@@ -1,14 +1,27 @@
+import hashlib
 import json
+import logging
 import os
 from pathlib import Path
 
 import matplotlib.pyplot as plt
+import nltk
+import numpy as np
+from artifacts import (
+    replace_artifact_dir,
+    save_model,
+    save_representation,
+    staging_artifact_dir,
+)
 from classification_method import (
+    hist_gradient_boosting_classifier,
     logistic_regression_classifier,
     multinomial_nb_classifier,
     random_forest_classifier,
+    random_forest_memory_capped_classifier,
     svc_classifier,
 )
+from feature_selection import select_features
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 from nltk.tokenize import word_tokenize
@@ -17,29 +30,126 @@ from representation_method import (
     tfidf_representation,
     word2vec_representation,
 )
-from sklearn.model_selection import train_test_split
+from scipy import sparse
+from sklearn.model_selection import StratifiedGroupKFold, train_test_split
 
+# Normalization cache: maps each distinct surface token to its normalized form
+# ("" when the token is dropped), so every word is lowercased, checked against
+# the stopword list and lemmatized only once across all corpora.
+_token_cache: dict[str, str] = {}
+_stop_words = None
+_lemmatizer = None
+STOPWORD_LANGUAGE = "portuguese"
 
-def preprocess_text(text):
+
+def normalize_token(token):
     """
-    Tokenizes, lowercases, removes stopwords, and lemmatizes the input text.
+    Lowercases, filters and lemmatizes a single token, memoized per surface form.
+
+    Returns an empty string when the token is a stopword or non-alphanumeric.
+    """
+
+    global _stop_words, _lemmatizer
+
+    normalized = _token_cache.get(token)
+    if normalized is not None:
+        return normalized
+
+    # Resources are loaded lazily because the NLTK data is only downloaded in main()
+    if _stop_words is None:
+        _stop_words = set(stopwords.words(STOPWORD_LANGUAGE))
+        _lemmatizer = WordNetLemmatizer()
+
+    lowered = token.lower()
+    if lowered.isalnum() and lowered not in _stop_words:
+        normalized = _lemmatizer.lemmatize(lowered)
+    else:
+        normalized = ""
+
+    _token_cache[token] = normalized
+    return normalized
+
+
+def token_cache_header():
+    """
+    Describes the resources the normalizations depend on, so that a cache built
+    with another stopword list or NLTK version is not reused.
+    """
+    words = "\n".join(sorted(stopwords.words(STOPWORD_LANGUAGE)))
+    return {
+        "stopword_language": STOPWORD_LANGUAGE,
+        "stopwords_sha1": hashlib.sha1(words.encode("utf-8")).hexdigest(),
+        "lemmatizer": "WordNetLemmatizer",
+        "nltk_version": nltk.__version__,
+    }
+
+
+def load_token_cache(file_path_str):
+    """
+    Loads a previously saved normalization cache, if present, into memory.
+
+    The cache is dropped when it cannot be read or was built with other NLTK
+    resources than the current ones.
     """
 
-    tokens = word_tokenize(text)
-    tokens = [token.lower() for token in tokens]
+    path = Path(file_path_str)
+    if not path.exists():
+        return 0
 
-    stop_words = set(stopwords.words("portuguese"))
-    tokens = [token for token in tokens if token.isalnum() and token not in stop_words]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable token cache {path}: {e}")
+        return 0
 
-    lemmatizer = WordNetLemmatizer()
-    tokens = [lemmatizer.lemmatize(token) for token in tokens]
+    if not isinstance(cache, dict) or cache.get("header") != token_cache_header():
+        logging.info(f"Ignoring token cache {path} built with other NLTK resources")
+        return 0
 
-    return " ".join(tokens)
+    _token_cache.update(cache["tokens"])
+    logging.info(f"Loaded {len(_token_cache)} cached tokens from {path}")
+    return len(_token_cache)
 
 
-def apply_representation_method(method_name, dataframe):
+def save_token_cache(file_path_str):
+    """
+    Persists the normalization cache as JSON so later runs can reuse it.
+
+    The file is written under a temporary name and renamed, so an interrupted
+    run never leaves a truncated cache behind.
+    """
+
+    path = Path(file_path_str)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"header": token_cache_header(), "tokens": _token_cache},
+            f,
+            ensure_ascii=False,
+        )
+    os.replace(tmp_path, path)
+
+    logging.info(f"Saved {len(_token_cache)} cached tokens to {path}")
+
+
+def preprocess_text(text):
+    """
+    Tokenizes, lowercases, removes stopwords, and lemmatizes the input text.
+    """
+
+    tokens = (normalize_token(token) for token in word_tokenize(text))
+
+    return " ".join(token for token in tokens if token)
+
+
+def apply_representation_method(method_name, dataframe, dtype=None):
     """
     Maps a method name to the respective representation function and applies it.
+
+    When dtype is None each representation uses its own default dtype.
     """
 
     method_map = {
@@ -51,26 +161,82 @@ def apply_representation_method(method_name, dataframe):
     if method_name not in method_map:
         raise ValueError(f"Unknown method: {method_name}")
 
+    dtype_kwargs = {"dtype": dtype} if dtype is not None else {}
+
     return {
         "representation_method": method_name,
-        "representation": method_map[method_name](dataframe),
+        "representation": method_map[method_name](dataframe, **dtype_kwargs),
     }
 
 
-def run_classification_methods(representation, dataframe):
+def prepare_features(representation, dataframe, feature_selection=None, dtype=None):
     """
-    Given a representation method and dataframe, splits data, runs classifiers,
-    and returns results.
+    Builds the representation, splits it into train and test sets and applies
+    the optional feature selection stage (fitted on the training split only).
+    When the dataframe has a 'DupGroup' column, near-duplicates are kept
+    together on one side of the split.
+
+    Returns a dict with the split matrices, labels and row indices, the fitted
+    representation state, the feature selection steps and report, and the full
+    matrix dtype.
     """
 
-    result = apply_representation_method(representation, dataframe)
-    x_full, y_full = result["representation"]
+    result = apply_representation_method(representation, dataframe, dtype=dtype)
+    x_full, y_full, state = result["representation"]
+
+    # Split row indices so the same partition can be stored and extended later
+    y_full = np.asarray(y_full)
+    if "DupGroup" in dataframe:
+        # Keep each near-duplicate cluster on one side of the split (~20% test)
+        splitter = StratifiedGroupKFold(n_splits=5, shuffle=True, random_state=52)
+        train_index, test_index = next(
+            splitter.split(np.zeros(len(y_full)), y_full, dataframe["DupGroup"])
+        )
+    else:
+        train_index, test_index = train_test_split(
+            np.arange(len(y_full)), test_size=0.2, random_state=52, stratify=y_full
+        )
+    x_train, x_test = x_full[train_index], x_full[test_index]
+    y_train, y_test = y_full[train_index], y_full[test_index]
+
+    selection_report = None
+    selection_steps = None
+    if feature_selection:
+        x_train, x_test, selection_report, selection_steps = select_features(
+            x_train, x_test, y_train, feature_selection
+        )
+        logging.info(
+            f"Feature selection for {representation}: "
+            f"{selection_report['n_features_before']} -> {selection_report['n_features_after']} features, "
+            f"{selection_report['memory_mb_before']:.1f} MB -> {selection_report['memory_mb_after']:.1f} MB"
+        )
+
+    if dtype is not None and x_train.dtype != dtype:
+        logging.warning(
+            f"{representation} features were upcast to {x_train.dtype} before classification"
+        )
+
+    return {
+        "x_train": x_train,
+        "x_test": x_test,
+        "y_train": y_train,
+        "y_test": y_test,
+        "state": state,
+        "dtype": x_full.dtype,
+        "train_index": train_index,
+        "test_index": test_index,
+        "selection_report": selection_report,
+        "selection_steps": selection_steps,
+    }
+
 
-    x_train, x_test, y_train, y_test = train_test_split(
-        x_full, y_full, test_size=0.2, random_state=52, stratify=y_full
-    )
+def get_classifiers(memory_capped_rf=False, dense=False):
+    """
+    Returns the classifier functions to run, keyed by classifier name.
 
-    results = []
+    With memory_capped_rf, RandomForest is replaced by its memory-capped variant
+    and, for dense features, HistGradientBoosting is added.
+    """
 
     classifiers = {
         "SVC": svc_classifier,
@@ -79,15 +245,80 @@ def run_classification_methods(representation, dataframe):
         "RandomForest": random_forest_classifier,
     }
 
-    for clf_name, clf_func in classifiers.items():
-        results.append(
-            {
-                "method_representation": representation,
-                "method_classification": clf_name,
-                "result": clf_func(x_train, y_train, x_test, y_test),
-            }
+    if memory_capped_rf:
+        classifiers["RandomForest"] = random_forest_memory_capped_classifier
+        if dense:
+            classifiers["HistGradientBoosting"] = hist_gradient_boosting_classifier
+
+    return classifiers
+
+
+def run_classification_methods(
+    representation,
+    dataframe,
+    feature_selection=None,
+    memory_capped_rf=False,
+    dtype=None,
+    artifact_dir=None,
+):
+    """
+    Given a representation method and dataframe, splits data, runs classifiers,
+    and returns results.
+
+    When a feature_selection config is given, the selection stage is fitted on
+    the training split and applied before any classifier is trained.
+
+    With memory_capped_rf, RandomForest trains on float32 features with workers
+    capped by available RAM, and dense representations also run
+    HistGradientBoosting as a faster alternative.
+
+    With dtype=np.float32 the features stay in single precision from the
+    representation to the classifiers; a warning is logged on any upcast.
+    Note that SVC (libsvm) still computes in float64 internally.
+
+    When artifact_dir is given, the fitted representation and every trained
+    classifier are saved there as reusable artifact bundles. They are written
+    to a staging directory that replaces artifact_dir once all classifiers are
+    trained, so bundles of earlier runs never outlive their representation.
+    """
+
+    features = prepare_features(representation, dataframe, feature_selection, dtype)
+    x_train, x_test = features["x_train"], features["x_test"]
+    y_train, y_test = features["y_train"], features["y_test"]
+    selection_report = features["selection_report"]
+
+    results = []
+    classifiers = get_classifiers(memory_capped_rf, dense=not sparse.issparse(x_train))
+
+    staging_dir = None
+    if artifact_dir is not None:
+        staging_dir = staging_artifact_dir(artifact_dir)
+        save_representation(
+            staging_dir,
+            representation,
+            features["dtype"],
+            features["state"],
+            features["selection_steps"],
+            split=(features["train_index"], features["test_index"]),
+            n_documents=len(dataframe),
         )
 
+    for clf_name, clf_func in classifiers.items():
+        clf_result = clf_func(x_train, y_train, x_test, y_test)
+        item = {
+            "method_representation": representation,
+            "method_classification": clf_name,
+            "result": clf_result,
+            "feature_selection": selection_report,
+        }
+        if staging_dir is not None:
+            save_model(staging_dir, clf_name, clf_result)
+            item["artifact"] = str(Path(artifact_dir) / clf_name)
+        results.append(item)
+
+    if staging_dir is not None:
+        replace_artifact_dir(staging_dir, artifact_dir)
+
     return results
 
 
@@ -103,14 +334,84 @@ def fill_results(dataset_key, base_results, representation_method, target_dict):
         classifier = item["method_classification"]
         result_data = item["result"]
 
-        target_dict[dataset_key][representation_method][classifier] = {
+        entry = {
             "model": str(result_data["model"]),
             "accuracy": result_data["accuracy"],
             "precision": result_data["precision"],
             "recall": result_data["recall"],
             "f1_score": result_data["f1_score"],
+            "fit_time": result_data["fit_time"],
+            "predict_time": result_data["predict_time"],
             # "confusion_matrix": result_data["confusion_matrix"],
         }
+        for key in ["n_jobs", "model_size_mb", "peak_rss_mb", "fit_memory_mb"]:
+            if key in result_data:
+                entry[key] = result_data[key]
+        if item.get("feature_selection"):
+            entry["feature_selection"] = item["feature_selection"]
+        if item.get("artifact"):
+            entry["artifact"] = item["artifact"]
+
+        target_dict[dataset_key][representation_method][classifier] = entry
+
+
+def compare_results(baseline, candidate):
+    """
+    Compares two results dictionaries with the same layout, entry by entry.
+
+    Returns a nested dict (base -> representation -> classifier) holding the
+    metric deltas (candidate - baseline) and the fit time ratio.
+    """
+
+    metrics = ["accuracy", "precision", "recall", "f1_score"]
+    comparison = {}
+
+    for dataset_key, representations in candidate.items():
+        for representation_method, classifiers in representations.items():
+            for classifier, entry in classifiers.items():
+                reference = (
+                    baseline.get(dataset_key, {})
+                    .get(representation_method, {})
+                    .get(classifier)
+                )
+                if reference is None:
+                    continue
+
+                row = {f"{m}_delta": entry[m] - reference[m] for m in metrics}
+                if reference.get("fit_time") and "fit_time" in entry:
+                    row["fit_time_ratio"] = entry["fit_time"] / reference["fit_time"]
+
+                comparison.setdefault(dataset_key, {}).setdefault(
+                    representation_method, {}
+                )[classifier] = row
+
+    return comparison
+
+
+def metrics_out_of_tolerance(comparison, tolerance):
+    """
+    Lists the entries of a compare_results output whose metric deltas exceed the tolerance.
+
+    Returns a list of (base, representation, classifier, metric, delta) tuples.
+    """
+
+    mismatches = []
+    for dataset_key, representations in comparison.items():
+        for representation_method, classifiers in representations.items():
+            for classifier, row in classifiers.items():
+                for key, delta in row.items():
+                    if key.endswith("_delta") and abs(delta) > tolerance:
+                        mismatches.append(
+                            (
+                                dataset_key,
+                                representation_method,
+                                classifier,
+                                key[: -len("_delta")],
+                                delta,
+                            )
+                        )
+
+    return mismatches
 
 
 def save_plot(filename, subfolder=""):